@@ -0,0 +1,79 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# compares building a live playerlist message payload for every guild on a realm
+# through ipy.Embed (copying a base embed per guild) with the dict templates
+# no network is involved - this only measures building the payloads
+# run with `python -m benchmarks.embed_templates` from the root of the repository
+
+import datetime
+import os
+import timeit
+
+import interactions as ipy
+
+from common.embed_templates import EmbedTemplate, embed_field, message_payload
+
+GUILDS = int(os.environ.get("BENCHMARK_GUILDS", "1000"))
+RUNS = 20
+
+JOINED = "\n".join(f"**Player{i}**" for i in range(5))
+LEFT = "\n".join(f"**Player{i}**" for i in range(5, 8))
+NOW = datetime.datetime.now(tz=datetime.UTC)
+
+
+def with_embeds() -> None:
+    base_embed = ipy.Embed(
+        color=ipy.RoleColors.DARK_GREY,
+        timestamp=ipy.Timestamp.fromdatetime(NOW),
+    )
+    base_embed.set_footer("8 players online")
+
+    for _ in range(GUILDS):
+        embed = ipy.Embed.from_dict(base_embed.to_dict())
+        embed.add_field(name=":green_circle: Joined", value=JOINED)
+        embed.add_field(name=":white_circle: Left", value=LEFT)
+        ipy.models.discord.message.process_message_payload(embeds=embed)
+
+
+def with_templates() -> None:
+    template = EmbedTemplate.create(
+        color=ipy.RoleColors.DARK_GREY,
+        footer="8 players online",
+        timestamp=NOW,
+    )
+
+    for _ in range(GUILDS):
+        embed = template.render(
+            fields=[
+                embed_field(":green_circle: Joined", JOINED),
+                embed_field(":white_circle: Left", LEFT),
+            ]
+        )
+        message_payload(embeds=[embed])
+
+
+def main() -> None:
+    for name, func in (("ipy.Embed", with_embeds), ("templates", with_templates)):
+        best = min(timeit.repeat(func, number=1, repeat=RUNS))
+        print(  # noqa: T201
+            f"{name}: {best * 1000:.2f}ms for {GUILDS} guilds"
+            f" ({best / GUILDS * 1_000_000:.2f}us per guild)"
+        )
+
+
+if __name__ == "__main__":
+    main()
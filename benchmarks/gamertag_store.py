@@ -0,0 +1,91 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# compares the memory usage and bulk read speed of the per-key gamertag storage with
+# the hash storage
+# run with `python -m benchmarks.gamertag_store` from the root of the repository
+# the hash storage needs valkey 9.0+ for HSETEX
+# this FLUSHES the database it is pointed at, so only ever use a local throwaway
+# instance - BENCHMARK_VALKEY_URL defaults to db 15 on localhost
+
+import asyncio
+import os
+import secrets
+import time
+
+import valkey.asyncio as aiovalkey
+
+from common.gamertag_store import GamertagStore
+
+AMOUNT = int(os.environ.get("BENCHMARK_AMOUNT", "100000"))
+READ_SIZE = 500  # about how many xuids a big playerlist resolves at once
+BATCH_SIZE = 5000
+
+
+async def used_memory(valkey: aiovalkey.Valkey) -> int:
+    info = await valkey.info("memory")
+    return int(info["used_memory"])
+
+
+async def bench(
+    valkey: aiovalkey.Valkey, mapping: dict[str, str], use_hash: bool
+) -> None:
+    store = GamertagStore(valkey, use_hash=use_hash)
+    await valkey.flushdb()
+    before = await used_memory(valkey)
+
+    items = list(mapping.items())
+    for index in range(0, len(items), BATCH_SIZE):
+        await store.set_gamertags(dict(items[index : index + BATCH_SIZE]))
+
+    after = await used_memory(valkey)
+
+    xuids = list(mapping.keys())
+    start = time.perf_counter()
+    for index in range(0, len(xuids), READ_SIZE):
+        await store.get_gamertags(xuids[index : index + READ_SIZE])
+    elapsed = time.perf_counter() - start
+
+    mode = "hash" if use_hash else "keys"
+    print(  # noqa: T201
+        f"{mode}: {after - before:,} bytes for {len(mapping):,} players"
+        f" ({(after - before) / len(mapping):.1f} bytes each), read all in"
+        f" {elapsed:.3f}s with batches of {READ_SIZE}"
+    )
+
+
+async def main() -> None:
+    valkey = aiovalkey.Valkey.from_url(
+        os.environ.get("BENCHMARK_VALKEY_URL", "redis://localhost:6379/15"),
+        decode_responses=True,
+    )
+
+    # xuids are 16 digit numbers, and gamertags are usually 8-15 characters
+    mapping = {
+        str(2535400000000000 + i): f"Player{secrets.token_hex(4)}"
+        for i in range(AMOUNT)
+    }
+
+    try:
+        await bench(valkey, mapping, use_hash=False)
+        await bench(valkey, mapping, use_hash=True)
+    finally:
+        await valkey.flushdb()
+        await valkey.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -176,6 +176,8 @@ class DynamicLeaderboardPaginator:
     """The index of the current page being displayed"""
     timeout_interval: int = attrs.field(repr=False, default=120, kw_only=True)
     """How long until this paginator disables itself"""
+    lookahead: int = attrs.field(repr=False, default=1, kw_only=True)
+    """How many pages on either side of the current one to resolve gamertags for ahead of time"""
 
     context: ipy.InteractionContext | None = attrs.field(
         default=None, init=False, repr=False
@@ -189,6 +191,11 @@ class DynamicLeaderboardPaginator:
     _author_id: ipy.Snowflake_Type = attrs.field(
         repr=False, init=False, default=ipy.MISSING
     )
+    _gamertag_map: dict[str, str] = attrs.field(repr=False, init=False, factory=dict)
+    _resolved_pages: set[int] = attrs.field(repr=False, init=False, factory=set)
+    _prefetch_task: asyncio.Task | None = attrs.field(
+        repr=False, init=False, default=None
+    )
 
     def __attrs_post_init__(self) -> None:
         self.bot.add_component_callback(
@@ -277,13 +284,66 @@ class DynamicLeaderboardPaginator:
         ]
         return ipy.spread_to_rows(*output)
 
+    def _page_xuids(self, page_index: int) -> list[str]:
+        return [e[0] for e in self.pages_data[page_index * 20 : (page_index * 20) + 20]]
+
+    def _unresolved_window(self) -> list[int]:
+        return [
+            i
+            for i in range(
+                max(0, self.page_index - self.lookahead),
+                min(self.last_page_index, self.page_index + self.lookahead) + 1,
+            )
+            if i not in self._resolved_pages
+        ]
+
+    async def _resolve_pages(self, page_indexes: list[int]) -> None:
+        # one batch for all of the pages, rather than one per page
+        xuids = [
+            xuid
+            for i in page_indexes
+            for xuid in self._page_xuids(i)
+            if xuid not in self.nicknames and xuid not in self._gamertag_map
+        ]
+        if xuids:
+            self._gamertag_map.update(
+                await pl_utils.get_xuid_to_gamertag_map(self.bot, xuids)
+            )
+        self._resolved_pages.update(page_indexes)
+
+    async def _prefetch_pages(self, page_indexes: list[int]) -> None:
+        try:
+            await self._resolve_pages(page_indexes)
+        except Exception as e:
+            await utils.error_handle(e)
+
+    async def get_gamertag_map(self) -> dict[str, str]:
+        """
+        Gets the gamertags for the current page, resolving them if they haven't been
+        already, and starts resolving the pages around it in the background.
+        """
+        if (
+            self.page_index not in self._resolved_pages
+            and self._prefetch_task
+            and not self._prefetch_task.done()
+        ):
+            # the page we want may be getting resolved already
+            await asyncio.shield(self._prefetch_task)
+
+        if self.page_index not in self._resolved_pages:
+            await self._resolve_pages(self._unresolved_window())
+
+        if (window := self._unresolved_window()) and (
+            not self._prefetch_task or self._prefetch_task.done()
+        ):
+            self._prefetch_task = self.bot.create_task(self._prefetch_pages(window))
+
+        return self._gamertag_map
+
     async def to_dict(self) -> dict:
         """Convert this paginator into a dictionary for sending."""
         page_data = self.pages_data[self.page_index * 20 : (self.page_index * 20) + 20]
-
-        gamertag_map = await pl_utils.get_xuid_to_gamertag_map(
-            self.bot, [e[0] for e in page_data if e[0] not in self.nicknames]
-        )
+        gamertag_map = await self.get_gamertag_map()
 
         leaderboard_builder: list[str] = []
         index = self.page_index * 20
@@ -297,7 +357,10 @@ class DynamicLeaderboardPaginator:
                 precisedelta = "1 minute"
 
             display = models.display_gamertag(
-                xuid, gamertag_map[xuid], self.nicknames.get(xuid), markdown="**"
+                xuid,
+                gamertag_map.get(xuid, ""),
+                self.nicknames.get(xuid),
+                markdown="**",
             )
 
             leaderboard_builder.append(f"**{index+1}\\.** {display} {precisedelta}")
@@ -375,13 +438,15 @@ class DynamicRealmMembers(DynamicLeaderboardPaginator):
     owner_xuid: str = attrs.field(repr=False, kw_only=True)
     period_str: str = attrs.field(repr=False, kw_only=True, default="", init=False)
 
+    def _page_xuids(self, page_index: int) -> list[str]:
+        return [
+            p.uuid for p in self.pages_data[page_index * 20 : (page_index * 20) + 20]
+        ]
+
     async def to_dict(self) -> dict:
         """Convert this paginator into a dictionary for sending."""
         page_data = self.pages_data[self.page_index * 20 : (self.page_index * 20) + 20]
-
-        gamertag_map = await pl_utils.get_xuid_to_gamertag_map(
-            self.client, [p.uuid for p in page_data if p.uuid not in self.nicknames]
-        )
+        gamertag_map = await self.get_gamertag_map()
 
         str_builder: list[str] = []
         index = self.page_index * 20
@@ -390,7 +455,7 @@ class DynamicRealmMembers(DynamicLeaderboardPaginator):
             xuid = player.uuid
 
             base_display = models.display_gamertag(
-                xuid, gamertag_map[xuid], self.nicknames.get(xuid)
+                xuid, gamertag_map.get(xuid, ""), self.nicknames.get(xuid)
             )
 
             ending = ""
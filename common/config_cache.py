@@ -0,0 +1,284 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import copy
+import logging
+import typing
+import uuid
+from collections import defaultdict
+
+import attrs
+import valkey.asyncio as aiovalkey
+from tortoise.signals import Signals
+
+from common.models import GuildConfig, PremiumCode
+
+logger = logging.getLogger("realms_bot")
+
+INVALIDATION_CHANNEL = "rpl-config-invalidate"
+
+
+def _premium_loaded(config: GuildConfig) -> bool:
+    # tortoise stores fetched relations under an underscored name - if it isn't
+    # there, accessing premium_code would give us a query instead of the code
+    return config.premium_code_id is None or hasattr(config, "_premium_code")
+
+
+def _copy(config: GuildConfig) -> GuildConfig:
+    # shallow, other than the json/array fields - those get changed in place
+    new = copy.copy(config)
+    for name in config._meta.fields_map:
+        if name not in config._meta.fetch_fields and isinstance(
+            value := getattr(config, name), dict | list | set
+        ):
+            setattr(new, name, copy.copy(value))
+    return new
+
+
+def _snapshot(config: GuildConfig) -> dict[str, typing.Any]:
+    return {
+        name: getattr(config, name)
+        for name in config._meta.fields_map
+        if name not in config._meta.fetch_fields
+    }
+
+
+@attrs.define()
+class GuildConfigCache:
+    """
+    An in-memory cache of every guild config, indexed by guild and Realm ID.
+
+    Saves and deletes done through model instances are written through
+    automatically via signals, and other processes are told to refresh their copy
+    via Valkey pub/sub. Queryset-level updates and deletes skip signals, so those
+    must call `invalidate` themselves.
+    """
+
+    valkey: aiovalkey.Valkey = attrs.field()
+
+    by_guild: dict[int, GuildConfig] = attrs.field(init=False, factory=dict)
+    by_realm: defaultdict[str, set[int]] = attrs.field(
+        init=False, factory=lambda: defaultdict(set)
+    )
+    instance_id: str = attrs.field(init=False, factory=lambda: uuid.uuid4().hex)
+    # what realm each guild is indexed under in by_realm - can't go off of the
+    # config itself, as by the time it's saved the old realm id is gone
+    _indexed_realms: dict[int, str] = attrs.field(init=False, factory=dict)
+    # called with the old and new config (either can be None) whenever one changes,
+    # for anything that keeps its own state based off of configs
+    change_listeners: list[
+        typing.Callable[[GuildConfig | None, GuildConfig | None], None]
+    ] = attrs.field(init=False, factory=list)
+
+    def __attrs_post_init__(self) -> None:
+        GuildConfig.register_listener(Signals.post_save, self._on_config_save)
+        GuildConfig.register_listener(Signals.post_delete, self._on_config_delete)
+        PremiumCode.register_listener(Signals.post_save, self._on_code_change)
+        PremiumCode.register_listener(Signals.post_delete, self._on_code_change)
+
+    async def populate(self) -> None:
+        seen: set[int] = set()
+
+        async for config in GuildConfig.all().prefetch_related("premium_code"):
+            self._put(config)
+            seen.add(config.guild_id)
+
+        for guild_id in self.by_guild.keys() - seen:
+            self._evict(guild_id)
+
+    def _put(self, config: GuildConfig) -> None:
+        self._unindex(config.guild_id)
+
+        # stored as a copy, so whoever saved it can't change what's cached
+        old = self.by_guild.get(config.guild_id)
+        new = self.by_guild[config.guild_id] = _copy(config)
+        if config.realm_id:
+            self.by_realm[config.realm_id].add(config.guild_id)
+            self._indexed_realms[config.guild_id] = config.realm_id
+
+        self._notify(old, new)
+
+    def _evict(self, guild_id: int) -> None:
+        self._unindex(guild_id)
+        if old := self.by_guild.pop(guild_id, None):
+            self._notify(old, None)
+
+    def _notify(self, old: GuildConfig | None, new: GuildConfig | None) -> None:
+        for listener in self.change_listeners:
+            try:
+                listener(old, new)
+            except Exception:
+                logger.exception("Config change listener errored.")
+
+    def _unindex(self, guild_id: int) -> None:
+        if (realm_id := self._indexed_realms.pop(guild_id, None)) is None:
+            return
+
+        guild_ids = self.by_realm[realm_id]
+        guild_ids.discard(guild_id)
+        if not guild_ids:
+            del self.by_realm[realm_id]
+
+    def _fresh(self, config: GuildConfig) -> GuildConfig:
+        # everyone gets their own copy, so changes that never get saved don't
+        # end up in the cache
+        config = _copy(config)
+
+        # both of these are cached on the object, which is fine for a
+        # short-lived object but not for one that lives as long as the bot does
+        config.__dict__.pop("valid_premium", None)
+        if config.premium_code_id is not None and _premium_loaded(config):
+            config.premium_code._valid_code = None
+        return config
+
+    def get(self, guild_id: int) -> GuildConfig | None:
+        if config := self.by_guild.get(int(guild_id)):
+            return self._fresh(config)
+        return None
+
+    def for_realm(
+        self, realm_id: str, *, guild_ids: typing.Iterable[int] | None = None
+    ) -> list[GuildConfig]:
+        ids = self.by_realm.get(realm_id, set())
+        if guild_ids is not None:
+            ids = ids.intersection(guild_ids)
+        return [self._fresh(self.by_guild[guild_id]) for guild_id in ids]
+
+    def filter(
+        self, predicate: typing.Callable[[GuildConfig], bool]
+    ) -> list[GuildConfig]:
+        return [
+            self._fresh(config)
+            for config in self.by_guild.values()
+            if predicate(config)
+        ]
+
+    async def fetch(self, guild_id: int) -> GuildConfig | None:
+        """Gets a config from the cache, falling back to the database."""
+        return self.get(guild_id) or await self.refresh(guild_id)
+
+    async def refresh(self, guild_id: int) -> GuildConfig | None:
+        """Reloads a config from the database, without telling other processes."""
+        config = await GuildConfig.get_or_none(guild_id=int(guild_id)).prefetch_related(
+            "premium_code"
+        )
+        if config:
+            self._put(config)
+        else:
+            self._evict(int(guild_id))
+        return config
+
+    async def invalidate(self, *guild_ids: int) -> None:
+        """Reloads the given configs here and in every other process."""
+        await asyncio.gather(*(self.refresh(guild_id) for guild_id in guild_ids))
+        await self._publish(guild_ids)
+
+    async def invalidate_where(
+        self, predicate: typing.Callable[[GuildConfig], bool]
+    ) -> None:
+        await self.invalidate(
+            *(
+                guild_id
+                for guild_id, config in self.by_guild.items()
+                if predicate(config)
+            )
+        )
+
+    async def _publish(self, guild_ids: typing.Iterable[int]) -> None:
+        if guild_ids := tuple(guild_ids):
+            await self.valkey.publish(
+                INVALIDATION_CHANNEL,
+                f"{self.instance_id}|{','.join(str(g) for g in guild_ids)}",
+            )
+
+    async def _on_config_save(
+        self,
+        _: type[GuildConfig],
+        instance: GuildConfig,
+        *__: typing.Any,
+    ) -> None:
+        if _premium_loaded(instance):
+            self._put(instance)
+        else:
+            await self.refresh(instance.guild_id)
+        await self._publish((instance.guild_id,))
+
+    async def _on_config_delete(
+        self,
+        _: type[GuildConfig],
+        instance: GuildConfig,
+        *__: typing.Any,
+    ) -> None:
+        self._evict(instance.guild_id)
+        await self._publish((instance.guild_id,))
+
+    async def _on_code_change(
+        self,
+        _: type[PremiumCode],
+        instance: PremiumCode,
+        *__: typing.Any,
+    ) -> None:
+        await self.invalidate_where(lambda c: c.premium_code_id == instance.id)
+
+    async def listen(self) -> typing.NoReturn:
+        """Refreshes configs other processes tell us have changed. Runs forever."""
+        while True:
+            try:
+                async with self.valkey.pubsub() as pubsub:
+                    await pubsub.subscribe(INVALIDATION_CHANNEL)
+
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+
+                        instance_id, guild_ids = message["data"].split("|", 1)
+                        if instance_id == self.instance_id:
+                            continue
+
+                        await asyncio.gather(
+                            *(self.refresh(int(g)) for g in guild_ids.split(","))
+                        )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # we may have missed invalidations while disconnected, so
+                # there's no way around reloading everything
+                logger.exception("Config cache listener errored, resubscribing.")
+                await asyncio.sleep(5)
+                await self.populate()
+
+    async def check_consistency(self) -> tuple[set[int], set[int], set[int]]:
+        """
+        Compares the cache against the database.
+
+        Returns:
+            The guild IDs missing from the cache, the ones in the cache but not in
+            the database, and the ones whose cached config differs.
+        """
+        db_configs = {
+            config.guild_id: config
+            async for config in GuildConfig.all().prefetch_related("premium_code")
+        }
+
+        missing = db_configs.keys() - self.by_guild.keys()
+        extra = self.by_guild.keys() - db_configs.keys()
+        differing = {
+            guild_id
+            for guild_id in db_configs.keys() & self.by_guild.keys()
+            if _snapshot(db_configs[guild_id]) != _snapshot(self.by_guild[guild_id])
+        }
+        return set(missing), set(extra), differing
@@ -0,0 +1,161 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import typing
+
+import attrs
+import interactions as ipy
+
+import common.utils as utils
+
+# how long to wait before retrying something, at a minimum
+# if the channel is ratelimited for longer, we wait that out instead
+RETRY_BACKOFF = 5.0
+
+
+def stable_slot(key: int, window: float) -> float:
+    """
+    Gets how far into the window something keyed by `key` should run.
+    This is the same on every run, so things keep running at a consistent time.
+    """
+    if window <= 0:
+        return 0.0
+
+    # snowflakes are roughly sequential, so hash them to spread them out evenly
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest) / 2**64 * window
+
+
+@attrs.define(kw_only=True)
+class DispatchJob:
+    key: int = attrs.field()
+    channel_id: ipy.Snowflake_Type = attrs.field()
+    func: typing.Callable[["DispatchJob"], typing.Awaitable[typing.Any]] = attrs.field()
+
+    # how many messages have gone out, so that a retry can pick up from the
+    # one that failed rather than sending everything again
+    sent: int = attrs.field(default=0)
+    # if a message is being sent right now - if the job times out in the middle
+    # of that, there's no telling if it went out or not
+    sending: bool = attrs.field(default=False)
+
+    def mark_sending(self) -> None:
+        self.sending = True
+
+    def mark_sent(self) -> None:
+        self.sending = False
+        self.sent += 1
+
+
+@attrs.define(kw_only=True)
+class DispatchStats:
+    started_at: datetime.datetime = attrs.field()
+    total: int = attrs.field(default=0)
+    completed: int = attrs.field(default=0)
+    timed_out: int = attrs.field(default=0)
+    failed: int = attrs.field(default=0)
+    retried: int = attrs.field(default=0)
+    max_lateness: float = attrs.field(default=0.0)
+    duration: float = attrs.field(default=0.0)
+
+
+@attrs.define()
+class StaggeredDispatcher:
+    """
+    Runs a batch of jobs spread out over a window of time, with a limit on how
+    many can run at once.
+
+    Each job has a stable slot in the window based on its key. If every
+    concurrent run is taken up when a job's slot comes around, it runs late
+    rather than adding to the pile.
+    """
+
+    bot: "utils.RealmBotBase" = attrs.field()
+    window: float = attrs.field(kw_only=True)
+    concurrency: int = attrs.field(kw_only=True)
+    timeout: float = attrs.field(default=60, kw_only=True)
+    retries: int = attrs.field(default=2, kw_only=True)
+
+    async def run(self, jobs: list[DispatchJob]) -> DispatchStats:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        stats = DispatchStats(
+            started_at=datetime.datetime.now(tz=datetime.UTC), total=len(jobs)
+        )
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: list[asyncio.Task] = []
+
+        for slot, job in sorted(
+            ((stable_slot(job.key, self.window), job) for job in jobs),
+            key=lambda j: j[0],
+        ):
+            if (delay := start + slot - loop.time()) > 0:
+                await asyncio.sleep(delay)
+
+            await semaphore.acquire()
+            stats.max_lateness = max(stats.max_lateness, loop.time() - start - slot)
+            tasks.append(self.bot.create_task(self._run_job(job, stats, semaphore)))
+
+        await asyncio.gather(*tasks)
+        stats.duration = loop.time() - start
+        return stats
+
+    async def _run_job(
+        self,
+        job: DispatchJob,
+        stats: DispatchStats,
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    await asyncio.wait_for(job.func(job), timeout=self.timeout)
+                except TimeoutError:
+                    # if a message was in the middle of going out, retrying
+                    # could end up sending it twice
+                    if attempt == self.retries or job.sending:
+                        stats.timed_out += 1
+                        return
+                except ipy.errors.HTTPException as e:
+                    # only ratelimits and discord having issues are worth retrying
+                    if (e.status != 429 and e.status < 500) or attempt == self.retries:
+                        raise
+                    # the message that was going out failed, so it's safe to redo
+                    job.sending = False
+                else:
+                    stats.completed += 1
+                    return
+
+                stats.retried += 1
+
+                # we keep our spot while waiting - if we're being ratelimited,
+                # starting up more jobs would only make it worse
+                await asyncio.sleep(
+                    max(
+                        self.bot.send_scheduler.retry_after(job.channel_id),
+                        RETRY_BACKOFF * (attempt + 1),
+                    )
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            stats.failed += 1
+            await utils.error_handle(e)
+        finally:
+            semaphore.release()
@@ -0,0 +1,133 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# embeds as plain dicts, in the form discord expects them
+# building an ipy.Embed and converting it is fine for one-off messages, but on
+# paths that send the same embed to hundreds of guilds, it adds up
+
+import datetime
+import typing
+
+import attrs
+import interactions as ipy
+
+# discord's limits for the embeds in a single message
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+
+def embed_field(name: str, value: str, *, inline: bool = False) -> dict:
+    return {"name": name, "value": value, "inline": inline}
+
+
+@attrs.define(frozen=True)
+class EmbedTemplate:
+    """The static parts of an embed, which can be filled in without copying them."""
+
+    base: dict[str, typing.Any] = attrs.field()
+
+    @classmethod
+    def create(
+        cls,
+        *,
+        color: ipy.Color | int | None = None,
+        title: str | None = None,
+        footer: str | None = None,
+        timestamp: datetime.datetime | None = None,
+    ) -> typing.Self:
+        base: dict[str, typing.Any] = {"type": "rich"}
+        if color is not None:
+            base["color"] = color.value if isinstance(color, ipy.Color) else color
+        if title:
+            base["title"] = title
+        if footer:
+            base["footer"] = {"text": footer}
+        if timestamp:
+            base["timestamp"] = timestamp.isoformat()
+        return cls(base)
+
+    def render(
+        self,
+        *,
+        description: str | None = None,
+        fields: list[dict] | None = None,
+        **overrides: typing.Any,
+    ) -> dict[str, typing.Any]:
+        # only the top level is copied - nested parts of the base are shared,
+        # so never mutate what this returns past the top level
+        embed = self.base | overrides
+        if description is not None:
+            embed["description"] = description
+        if fields:
+            embed["fields"] = fields
+        return embed
+
+
+def message_payload(
+    content: str | None = None,
+    *,
+    embeds: list[dict] | None = None,
+    allowed_mentions: ipy.AllowedMentions | None = None,
+) -> dict[str, typing.Any]:
+    payload: dict[str, typing.Any] = {}
+    if content:
+        payload["content"] = content
+    if embeds:
+        payload["embeds"] = embeds
+    if allowed_mentions:
+        payload["allowed_mentions"] = allowed_mentions.to_dict()
+    return payload
+
+
+def embed_length(embed: dict[str, typing.Any]) -> int:
+    """Gets the length of an embed, as discord counts it towards a message's limit."""
+    length = len(embed.get("title", "")) + len(embed.get("description", ""))
+    if footer := embed.get("footer"):
+        length += len(footer.get("text", ""))
+    if author := embed.get("author"):
+        length += len(author.get("name", ""))
+    for field in embed.get("fields", ()):
+        length += len(field["name"]) + len(field["value"])
+    return length
+
+
+def pack_embeds(
+    embeds: list[dict[str, typing.Any]],
+) -> list[list[dict[str, typing.Any]]]:
+    """
+    Groups embeds, in order, into as few messages as discord's limits allow.
+    Each embed is assumed to be within the limits by itself.
+    """
+    messages: list[list[dict[str, typing.Any]]] = []
+    current: list[dict[str, typing.Any]] = []
+    current_length = 0
+
+    for embed in embeds:
+        length = embed_length(embed)
+        if current and (
+            len(current) >= MAX_EMBEDS_PER_MESSAGE
+            or current_length + length > MAX_EMBED_CHARS_PER_MESSAGE
+        ):
+            messages.append(current)
+            current = []
+            current_length = 0
+
+        current.append(embed)
+        current_length += length
+
+    if current:
+        messages.append(current)
+    return messages
@@ -0,0 +1,133 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import time
+import typing
+from collections import defaultdict, deque
+
+import attrs
+
+import common.utils as utils
+
+
+@attrs.define()
+class _Item:
+    func: typing.Callable[[], typing.Awaitable[typing.Any]] = attrs.field()
+    enqueued_at: float = attrs.field()
+
+
+@attrs.define()
+class RealmFairQueue:
+    """
+    Runs work for many Realms, taking turns between Realms so that one
+    Realm with a lot of work can't make every other Realm wait on it.
+
+    Turns are handed out through deficit round robin: each Realm with work
+    queued gets `quantum` items per turn before the next Realm is served.
+    """
+
+    bot: "utils.RealmBotBase" = attrs.field()
+    workers: int = attrs.field(default=10, kw_only=True)
+    quantum: int = attrs.field(default=4, kw_only=True)
+
+    _queues: dict[str, deque[_Item]] = attrs.field(init=False, factory=dict)
+    _active: deque[str] = attrs.field(init=False, factory=deque)
+    _deficits: dict[str, int] = attrs.field(init=False, factory=dict)
+    _wakeup: asyncio.Event = attrs.field(init=False, factory=asyncio.Event)
+    _tasks: list[asyncio.Task] = attrs.field(init=False, factory=list)
+
+    latencies: defaultdict[str, deque[float]] = attrs.field(
+        init=False, factory=lambda: defaultdict(lambda: deque(maxlen=200))
+    )
+
+    def start(self) -> None:
+        self._tasks = [
+            self.bot.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def put(
+        self,
+        realm_id: str,
+        func: typing.Callable[[], typing.Awaitable[typing.Any]],
+        *,
+        enqueued_at: float | None = None,
+    ) -> None:
+        if realm_id not in self._queues:
+            self._queues[realm_id] = deque()
+            self._deficits[realm_id] = self.quantum
+            self._active.append(realm_id)
+
+        self._queues[realm_id].append(
+            _Item(func, enqueued_at if enqueued_at is not None else time.perf_counter())
+        )
+        self._wakeup.set()
+
+    def _pop(self) -> tuple[str, _Item] | None:
+        while self._active:
+            realm_id = self._active[0]
+            queue = self._queues[realm_id]
+
+            if not queue:
+                self._active.popleft()
+                del self._queues[realm_id]
+                del self._deficits[realm_id]
+                continue
+
+            if self._deficits[realm_id] <= 0:
+                # turn's over - top it back up and go to the back of the line
+                self._deficits[realm_id] = self.quantum
+                self._active.rotate(-1)
+                continue
+
+            self._deficits[realm_id] -= 1
+            return realm_id, queue.popleft()
+
+        return None
+
+    async def _worker(self) -> None:
+        while True:
+            if not (popped := self._pop()):
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            realm_id, item = popped
+            try:
+                await item.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await utils.error_handle(e)
+            finally:
+                self.latencies[realm_id].append(time.perf_counter() - item.enqueued_at)
+
+    def p95(self, realm_id: str) -> float:
+        if not (latencies := sorted(self.latencies.get(realm_id, ()))):
+            return 0.0
+        return latencies[int(len(latencies) * 0.95)]
+
+    def stats(self) -> dict[str, tuple[int, float]]:
+        """Gets the amount of queued items and p95 latency for every Realm seen."""
+        return {
+            realm_id: (len(self._queues.get(realm_id, ())), self.p95(realm_id))
+            for realm_id in self.latencies.keys() | self._queues.keys()
+        }
@@ -0,0 +1,185 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import itertools
+import typing
+
+import attrs
+
+import common.utils as utils
+
+if typing.TYPE_CHECKING:
+    import valkey.asyncio as aiovalkey
+    from valkey.asyncio.client import Pipeline
+
+# note that neither of these can match the rpl-xuid-*/rpl-gt-* patterns of the
+# old per-key storage, or else migrating would pick them up too
+GAMERTAGS_HASH = "rpl-store-gamertags"  # xuid -> gamertag
+XUIDS_HASH = "rpl-store-xuids"  # gamertag -> xuid
+
+
+@attrs.define()
+class GamertagStore:
+    """
+    Handles reading and writing cached gamertags and XUIDs to Valkey.
+
+    By default, every entry is its own key (`rpl-xuid-{xuid}` and
+    `rpl-gt-{gamertag}`). With `use_hash`, everything is instead stored in two hashes
+    with per-field expiration (`HSETEX`, Valkey 9.0+), which uses a lot less memory
+    and lets lookups be a single `HMGET`.
+    """
+
+    valkey: "aiovalkey.Valkey" = attrs.field()
+    use_hash: bool = attrs.field(kw_only=True, default=False)
+
+    def _queue_hash_fields(
+        self, pipe: "Pipeline", name: str, mapping: dict[str, str], ttl: int
+    ) -> None:
+        pipe.execute_command(
+            "HSETEX",
+            name,
+            "EX",
+            ttl,
+            "FIELDS",
+            len(mapping),
+            *itertools.chain.from_iterable(mapping.items()),
+        )
+
+    def queue_xuid_entries(
+        self, pipe: "Pipeline", mapping: dict[str, str], ttl: int
+    ) -> None:
+        """Queues setting xuid -> value entries, without the reverse mapping."""
+        if not mapping:
+            return
+
+        if self.use_hash:
+            self._queue_hash_fields(pipe, GAMERTAGS_HASH, mapping, ttl)
+            return
+
+        for xuid, value in mapping.items():
+            pipe.setex(name=f"rpl-xuid-{xuid}", time=ttl, value=value)
+
+    def queue_gamertags(
+        self,
+        pipe: "Pipeline",
+        mapping: dict[str, str],
+        ttl: int = utils.EXPIRE_GAMERTAGS_AT,
+    ) -> None:
+        """Queues setting xuid -> gamertag entries, along with the reverse mapping."""
+        if not mapping:
+            return
+
+        self.queue_xuid_entries(pipe, mapping, ttl)
+
+        if self.use_hash:
+            self._queue_hash_fields(
+                pipe, XUIDS_HASH, {v: k for k, v in mapping.items()}, ttl
+            )
+            return
+
+        for xuid, gamertag in mapping.items():
+            pipe.setex(name=f"rpl-gt-{gamertag}", time=ttl, value=xuid)
+
+    async def set_gamertags(
+        self, mapping: dict[str, str], ttl: int = utils.EXPIRE_GAMERTAGS_AT
+    ) -> None:
+        async with self.valkey.pipeline() as pipe:
+            self.queue_gamertags(pipe, mapping, ttl)
+            await pipe.execute()
+
+    async def get_gamertags(self, xuids: typing.Sequence[str]) -> list[str | None]:
+        """Gets the cached values for the XUIDs given, in the same order."""
+        if not xuids:
+            return []
+
+        if self.use_hash:
+            return await self.valkey.hmget(GAMERTAGS_HASH, list(xuids))
+        return await self.valkey.mget([f"rpl-xuid-{xuid}" for xuid in xuids])
+
+    async def get_gamertag(self, xuid: str | int) -> str | None:
+        if self.use_hash:
+            return await self.valkey.hget(GAMERTAGS_HASH, str(xuid))
+        return await self.valkey.get(f"rpl-xuid-{xuid}")
+
+    async def get_xuid(self, gamertag: str) -> str | None:
+        if self.use_hash:
+            return await self.valkey.hget(XUIDS_HASH, gamertag)
+        return await self.valkey.get(f"rpl-gt-{gamertag}")
+
+    async def _migrate_pattern(
+        self, pattern: str, prefix: str, hash_name: str, batch_size: int
+    ) -> int:
+        migrated = 0
+        keys: list[str] = []
+
+        async def _migrate_batch() -> int:
+            async with self.valkey.pipeline() as pipe:
+                for key in keys:
+                    pipe.get(key)
+                    pipe.pttl(key)
+                results: list[typing.Any] = await pipe.execute()
+
+            count = 0
+
+            async with self.valkey.pipeline() as pipe:
+                for key, value, pttl in zip(
+                    keys, results[::2], results[1::2], strict=True
+                ):
+                    # pttl is negative if the key has expired or has no expiry
+                    if value is None or pttl <= 0:
+                        continue
+
+                    pipe.execute_command(
+                        "HSETEX",
+                        hash_name,
+                        "PX",
+                        pttl,
+                        "FIELDS",
+                        1,
+                        key.removeprefix(prefix),
+                        value,
+                    )
+                    count += 1
+
+                pipe.unlink(*keys)
+                await pipe.execute()
+
+            return count
+
+        async for key in self.valkey.scan_iter(pattern, count=batch_size):
+            keys.append(key)
+
+            if len(keys) >= batch_size:
+                migrated += await _migrate_batch()
+                keys = []
+
+        if keys:
+            migrated += await _migrate_batch()
+
+        return migrated
+
+    async def migrate_to_hash(self, batch_size: int = 500) -> int:
+        """
+        Moves entries from the old per-key storage into the hashes, keeping their
+        remaining TTLs. Returns the amount of entries migrated.
+        """
+        migrated = await self._migrate_pattern(
+            "rpl-xuid-*", "rpl-xuid-", GAMERTAGS_HASH, batch_size
+        )
+        migrated += await self._migrate_pattern(
+            "rpl-gt-*", "rpl-gt-", XUIDS_HASH, batch_size
+        )
+        return migrated
@@ -0,0 +1,313 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import contextlib
+import enum
+import logging
+import typing
+from collections import Counter
+
+import attrs
+import interactions as ipy
+
+import common.models as models
+import common.utils as utils
+
+logger = logging.getLogger("realms_bot")
+
+# expire time - one day plus a bit of leeway
+EXPIRE_INVALIDATIONS_AT = 87400
+
+# adds each pending count onto its counter, and gives back the new totals
+# counters that hit their limit are reset right away, so the next batch
+# doesn't trigger another unlink for the same thing
+FLUSH_SCRIPT = """
+local totals = {}
+local ttl = ARGV[#ARGV]
+for i, key in ipairs(KEYS) do
+    local total = redis.call('INCRBY', key, ARGV[i * 2 - 1])
+    if total >= tonumber(ARGV[i * 2]) then
+        redis.call('DEL', key)
+    else
+        redis.call('EXPIRE', key, ttl)
+    end
+    totals[i] = total
+end
+return totals
+"""
+
+UNLINK_PLAYERLIST_MSG = (
+    "The playerlist channel has been unlinked as the bot has not been able to"
+    " properly send messages to it. Please check your permissions, make sure the bot"
+    " has `View Channel`, `Send Messages`, and `Embed Links` enabled, and then re-set"
+    " the playerlist channel."
+)
+UNLINK_WATCHLIST_MSG = (
+    "The player watchlist players and channel has been unlinked as the bot has not"
+    " been able to properly send messages to it. Please check your permissions, make"
+    " sure the bot has `View Channel`, `Send Messages`, and `Embed Links` enabled, and"
+    " then re-set the watchlist and channel."
+)
+UNLINK_REALM_OFFLINE_MSG = (
+    "The Realm Offline role and channel has been unlinked as the bot has not been"
+    " able to properly send messages to it. Please check your permissions, make sure"
+    " the bot has `View Channel`, `Send Messages`, and `Embed Links` enabled, and then"
+    " re-set the role and channel."
+)
+UNLINK_REOCCURRING_LB_MSG = (
+    "The reoccurring leaderboard settings and channel has been unlinked as the bot"
+    " has not been able to properly send messages to it. Please check your"
+    " permissions, make sure the bot has `View Channel`, `Send Messages`, and `Embed"
+    " Links` enabled, and then re-set the settings and channel."
+)
+UNLINK_WEBHOOK_MSG = (
+    "Webhook delivery has been turned off as the bot has not been able to make a"
+    " webhook for this channel. Please make sure the bot has `Manage Webhooks`"
+    " enabled, and that this channel has less than 15 webhooks, and then turn it"
+    " back on."
+)
+
+
+class Invalidation(enum.StrEnum):
+    """
+    Things that get unlinked after failing too many times in a day.
+    The values are the prefixes of their counters in Valkey.
+    """
+
+    PLAYERLIST = "invalid-playerlist3"
+    # used for missing realms, which are already a day late by the time they warn
+    PLAYERLIST_MISSING = "invalid-playerlist7"
+    WATCHLIST = "invalid-watchlist"
+    REALM_OFFLINE = "invalid-realm-offline"
+    REOCCURRING_LB = "invalid-realm-reoccurring-lb"
+    LIVE_ONLINE = "invalid-liveonline"
+    WEBHOOK = "invalid-webhook"
+
+    @property
+    def limit(self) -> int:
+        return 7 if self is Invalidation.PLAYERLIST_MISSING else 3
+
+    def key(self, guild_id: int) -> str:
+        return f"{self.value}-{guild_id}"
+
+
+async def _notify(
+    bot: utils.RealmBotBase, channel_id: ipy.Snowflake_Type | None, msg: str
+) -> None:
+    if not channel_id:
+        return
+
+    with contextlib.suppress(ipy.errors.HTTPException, AttributeError):
+        await utils.partial_channel(bot, channel_id).send(msg)
+
+
+async def _unlink_playerlist(
+    bot: utils.RealmBotBase, config: models.GuildConfig
+) -> None:
+    # ALL of this is just to reset the config so that there's no more
+    # playerlist channel info
+    old_playerlist_chan = config.playerlist_chan
+    config.playerlist_chan = None
+    old_live_playerlist = config.live_playerlist
+    config.live_playerlist = False
+    old_watchlist = config.player_watchlist
+    config.player_watchlist = None
+    config.player_watchlist_role = None
+    config.notification_channels = {}
+    config.reoccurring_leaderboard = None
+    await config.save()
+    await bot.valkey.delete(
+        Invalidation.PLAYERLIST.key(config.guild_id),
+        Invalidation.PLAYERLIST_MISSING.key(config.guild_id),
+    )
+
+    if config.realm_id and old_watchlist:
+        for player_xuid in old_watchlist:
+            bot.player_watchlist_store[f"{config.realm_id}-{player_xuid}"].discard(
+                config.guild_id
+            )
+
+    if config.realm_id and old_live_playerlist:
+        bot.live_playerlist_store[config.realm_id].discard(config.guild_id)
+
+    await _notify(bot, old_playerlist_chan, UNLINK_PLAYERLIST_MSG)
+
+
+async def _unlink_watchlist(
+    bot: utils.RealmBotBase, config: models.GuildConfig
+) -> None:
+    old_watchlist = config.player_watchlist
+    config.player_watchlist = None
+    config.player_watchlist_role = None
+    old_chan = config.notification_channels.pop("player_watchlist", None)
+    await config.save()
+
+    if config.realm_id and old_watchlist:
+        for player_xuid in old_watchlist:
+            bot.player_watchlist_store[f"{config.realm_id}-{player_xuid}"].discard(
+                config.guild_id
+            )
+
+    await _notify(bot, old_chan, UNLINK_WATCHLIST_MSG)
+
+
+async def _unlink_realm_offline(
+    bot: utils.RealmBotBase, config: models.GuildConfig
+) -> None:
+    config.realm_offline_role = None
+    old_chan = config.notification_channels.pop("realm_offline", None)
+    await config.save()
+
+    await _notify(bot, old_chan, UNLINK_REALM_OFFLINE_MSG)
+
+
+async def _unlink_reoccurring_lb(
+    bot: utils.RealmBotBase, config: models.GuildConfig
+) -> None:
+    config.reoccurring_leaderboard = None
+    old_chan = config.notification_channels.pop("reoccurring_leaderboard", None)
+    await config.save()
+
+    await _notify(bot, old_chan, UNLINK_REOCCURRING_LB_MSG)
+
+
+async def _unlink_live_online(
+    _bot: utils.RealmBotBase, config: models.GuildConfig
+) -> None:
+    config.live_online_channel = None
+    await config.save()
+
+
+async def _unlink_webhook(bot: utils.RealmBotBase, config: models.GuildConfig) -> None:
+    # messages still go out normally when the webhook can't be made, so this
+    # only turns webhook delivery off rather than unlinking anything
+    config.webhook_delivery = False
+    await config.save()
+
+    await _notify(bot, config.playerlist_chan, UNLINK_WEBHOOK_MSG)
+
+
+UNLINKERS: dict[
+    Invalidation,
+    typing.Callable[[utils.RealmBotBase, models.GuildConfig], typing.Awaitable[None]],
+] = {
+    Invalidation.PLAYERLIST: _unlink_playerlist,
+    Invalidation.PLAYERLIST_MISSING: _unlink_playerlist,
+    Invalidation.WATCHLIST: _unlink_watchlist,
+    Invalidation.REALM_OFFLINE: _unlink_realm_offline,
+    Invalidation.REOCCURRING_LB: _unlink_reoccurring_lb,
+    Invalidation.LIVE_ONLINE: _unlink_live_online,
+    Invalidation.WEBHOOK: _unlink_webhook,
+}
+
+
+@attrs.define()
+class InvalidationCounter:
+    """
+    Counts up failures to send to something, and unlinks it once there have
+    been too many in a day.
+
+    Failures are only counted up in memory when they happen, and are written
+    to Valkey in one go every `interval` seconds - sends fail in bulk when
+    Discord is having issues, and doing a round trip for each one adds up.
+    Anything that went over its limit is unlinked in the background.
+    """
+
+    bot: "utils.RealmBotBase" = attrs.field()
+    interval: float = attrs.field(default=1.0, kw_only=True)
+
+    _pending: Counter[tuple[Invalidation, int]] = attrs.field(
+        init=False, factory=Counter
+    )
+    _script: typing.Any = attrs.field(init=False, default=None)
+    _task: asyncio.Task | None = attrs.field(init=False, default=None)
+
+    def __attrs_post_init__(self) -> None:
+        self._script = self.bot.valkey.register_script(FLUSH_SCRIPT)
+
+    def start(self) -> None:
+        self._task = self.bot.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+        # whatever's left shouldn't just be forgotten about
+        with contextlib.suppress(Exception):
+            await self.flush()
+
+    def add(self, kind: Invalidation, config: models.GuildConfig) -> None:
+        if not utils.FEATURE("EVENTUALLY_INVALIDATE"):
+            return
+        self._pending[kind, config.guild_id] += 1
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, Counter()
+        entries = list(pending.items())
+
+        args: list[int] = []
+        for (kind, _), amount in entries:
+            args.extend((amount, kind.limit))
+        args.append(EXPIRE_INVALIDATIONS_AT)
+
+        try:
+            totals: list[int] = await self._script(
+                keys=[kind.key(guild_id) for (kind, guild_id), _ in entries], args=args
+            )
+        except Exception:
+            # try again next time rather than losing the counts
+            self._pending.update(pending)
+            raise
+
+        logger.debug("Flushed %s invalidation counters.", len(entries))
+
+        if to_unlink := [
+            (kind, guild_id, total)
+            for ((kind, guild_id), _), total in zip(entries, totals, strict=True)
+            if total >= kind.limit
+        ]:
+            self.bot.create_task(self._unlink_all(to_unlink))
+
+    async def _unlink_all(self, to_unlink: list[tuple[Invalidation, int, int]]) -> None:
+        for kind, guild_id, total in to_unlink:
+            logger.info(
+                "Unlinking %s for guild %s with %s/%s invalidations.",
+                kind.name.lower(),
+                guild_id,
+                total,
+                kind.limit,
+            )
+
+            try:
+                if config := await self.bot.config_cache.fetch(guild_id):
+                    await UNLINKERS[kind](self.bot, config)
+            except Exception as e:
+                await utils.error_handle(e)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await utils.error_handle(e)
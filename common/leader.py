@@ -0,0 +1,178 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import socket
+import time
+import typing
+import uuid
+
+import attrs
+import valkey.asyncio as aiovalkey
+
+import common.utils as utils
+
+logger = logging.getLogger("realms_bot")
+
+LEASE_KEY = "rpl-leader"
+FENCE_KEY = "rpl-leader-fence"
+
+# SET NX PX, but also handing out a fencing token that only ever goes up,
+# so whoever holds the lease can tell if someone else took over in the meantime
+ACQUIRE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return false
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], ARGV[1] .. '|' .. token, 'PX', ARGV[2])
+return token
+"""
+
+# only extend or let go of the lease if it's still ours
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@attrs.define()
+class LeaderLease:
+    """
+    Makes sure only one process runs the work that should only be done once,
+    like polling Realms and the autorunners.
+
+    Every process tries to grab a lease in Valkey that expires after `ttl`
+    seconds. Whoever gets it is the leader and keeps renewing it - if they go
+    away, the lease expires and a standby takes over.
+    """
+
+    valkey: aiovalkey.Valkey = attrs.field()
+    ttl: float = attrs.field(default=10.0, kw_only=True)
+    interval: float = attrs.field(default=2.0, kw_only=True)
+
+    instance_id: str = attrs.field(
+        init=False,
+        factory=lambda: f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}",
+    )
+    token: int | None = attrs.field(init=False, default=None)
+    leader_since: float | None = attrs.field(init=False, default=None)
+    _last_renewed: float = attrs.field(init=False, default=0.0)
+    _became_leader: asyncio.Event = attrs.field(init=False, factory=asyncio.Event)
+    _acquire: typing.Any = attrs.field(init=False, default=None)
+    _renew: typing.Any = attrs.field(init=False, default=None)
+    _release: typing.Any = attrs.field(init=False, default=None)
+
+    def __attrs_post_init__(self) -> None:
+        self._acquire = self.valkey.register_script(ACQUIRE_SCRIPT)
+        self._renew = self.valkey.register_script(RENEW_SCRIPT)
+        self._release = self.valkey.register_script(RELEASE_SCRIPT)
+
+    @property
+    def value(self) -> str:
+        return f"{self.instance_id}|{self.token}"
+
+    @property
+    def is_leader(self) -> bool:
+        # the lease could've expired on valkey's end without us noticing yet,
+        # so don't trust it if we're close to when it would've
+        return (
+            self.token is not None
+            and time.monotonic() - self._last_renewed < self.ttl - self.interval
+        )
+
+    async def wait_until_leader(self) -> None:
+        while not self.is_leader:
+            self._became_leader.clear()
+            await self._became_leader.wait()
+
+    async def current(self) -> tuple[str, int] | None:
+        """Gets the instance ID and fencing token of the current leader, if any."""
+        if not (raw := await self.valkey.get(LEASE_KEY)):
+            return None
+        instance_id, token = raw.rsplit("|", 1)
+        return instance_id, int(token)
+
+    async def still_leader(self) -> bool:
+        """
+        Checks with Valkey if we still hold the lease. Used before doing
+        anything that would be bad to do twice.
+        """
+        if not self.is_leader:
+            return False
+        try:
+            return await self.valkey.get(LEASE_KEY) == self.value
+        except Exception:
+            return False
+
+    def _lost(self) -> None:
+        if self.token is not None:
+            logger.warning("Lost leadership (token %s).", self.token)
+        self.token = None
+        self.leader_since = None
+
+    async def _tick(self) -> None:
+        ttl_ms = int(self.ttl * 1000)
+        started = time.monotonic()
+
+        if self.token is not None:
+            if await self._renew(keys=[LEASE_KEY], args=[self.value, ttl_ms]):
+                self._last_renewed = started
+            else:
+                self._lost()
+            return
+
+        token = await self._acquire(
+            keys=[LEASE_KEY, FENCE_KEY], args=[self.instance_id, ttl_ms]
+        )
+        if token:
+            self.token = int(token)
+            self.leader_since = time.time()
+            self._last_renewed = started
+            logger.info("Became leader as %s (token %s).", self.instance_id, token)
+            self._became_leader.set()
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # if we can't reach valkey, we can't be sure we still hold the lease
+                if self.token is not None and not self.is_leader:
+                    self._lost()
+                await utils.error_handle(e)
+            await asyncio.sleep(self.interval)
+
+    async def release(self) -> None:
+        """Lets go of the lease so a standby can take over right away."""
+        if self.token is None:
+            return
+        with contextlib.suppress(Exception):
+            await self._release(keys=[LEASE_KEY], args=[self.value])
+        self._lost()
@@ -97,6 +97,9 @@ class GuildConfig(Model):
         source_field="reoccurring_leaderboard", null=True
     )
     nicknames = fields.JSONField(default="{}", source_field="nicknames")
+    webhook_delivery = fields.BooleanField(
+        default=False, source_field="webhook_delivery"
+    )
 
     premium_code: fields.ForeignKeyNullableRelation["PremiumCode"] = (
         fields.ForeignKeyField(
@@ -22,6 +22,7 @@ import interactions as ipy
 
 import common.models as models
 import common.playerlist_utils as pl_utils
+import common.utils as utils
 
 
 @typing.dataclass_transform(
@@ -39,12 +40,22 @@ class PlayerlistParseFinish(ipy.events.BaseEvent):
     containers: tuple[pl_utils.RealmPlayersContainer, ...] = attrs.field(repr=False)
 
 
+@define()
+class OnlineCacheResync(ipy.events.BaseEvent):
+    """Dispatched when who's online has been reloaded, after taking over as leader."""
+
+    token: int = attrs.field(repr=False)
+
+
 @define()
 class PlayerlistEvent(ipy.events.BaseEvent):
     realm_id: str = attrs.field(repr=False)
 
+    if typing.TYPE_CHECKING:
+        bot: utils.RealmBotBase
+
     async def configs(self) -> list[models.GuildConfig]:
-        return await models.GuildConfig.filter(realm_id=self.realm_id)
+        return self.bot.config_cache.for_realm(self.realm_id)
 
 
 @define()
@@ -78,10 +89,12 @@ class WarnMissingPlayerlist(PlayerlistEvent):
 
 @define()
 class PlayerWatchlistMatch(PlayerlistEvent):
-    player_xuid: str = attrs.field(repr=False)
-    guild_ids: set[int] = attrs.field(repr=False)
+    matches: dict[str, set[int]] = attrs.field(repr=False)
+    """The XUIDs of the watched players that joined, mapped to the guilds watching them."""
+
+    @property
+    def guild_ids(self) -> set[int]:
+        return set().union(*self.matches.values())
 
     async def configs(self) -> list[models.GuildConfig]:
-        return await models.GuildConfig.filter(
-            realm_id=self.realm_id, guild_id__in=list(self.guild_ids)
-        )
+        return self.bot.config_cache.for_realm(self.realm_id, guild_ids=self.guild_ids)
@@ -16,6 +16,7 @@ Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
 
 import asyncio
 import contextlib
+import datetime
 import logging
 import typing
 from collections import defaultdict
@@ -26,6 +27,7 @@ import elytra
 import interactions as ipy
 import orjson
 from msgspec import ValidationError
+from tortoise.expressions import Q
 from valkey.asyncio.client import Pipeline
 
 import common.models as models
@@ -62,6 +64,12 @@ class GamertagOnCooldown(Exception):
         super().__init__("The gamertag handler is on cooldown.")
 
 
+# stored in place of a gamertag for xuids that we know don't resolve to anything
+# (deleted accounts, invalid xuids, etc.) - gamertags can't have angle brackets,
+# so this won't ever clash with an actual gamertag
+GAMERTAG_TOMBSTONE = "<unknown>"
+
+
 class GamertagInfo(typing.NamedTuple):
     gamertag: str
     device: str | None = None
@@ -84,45 +92,57 @@ class GamertagHandler:
     responses: list[elytra.ProfileResponse | elytra.PeopleHubResponse] = attrs.field(
         init=False, factory=list
     )
+    invalid_xuids: set[str] = attrs.field(init=False, factory=set)
+    answered_xuids: set[str] = attrs.field(init=False, factory=set)
     AMOUNT_TO_GET: int = attrs.field(init=False, default=500)
 
     def __attrs_post_init__(self) -> None:
         # filter out empty strings, because that's possible somehow?
         self.xuids_to_get = tuple(x for x in self.xuids_to_get if x)
 
-    async def get_gamertags(self, xuid_list: list[str]) -> None:
-        # this endpoint is absolutely op and should rarely fail
-        # franky, we usually don't need the backup thing, but you can't go wrong
-        # having it
-
-        try:
-            people = await self.bot.xbox.fetch_people_batch(
-                xuid_list, dont_handle_ratelimit=True
-            )
+    async def _fetch_people_batch(self, xuid_list: list[str]) -> None:
+        while xuid_list:
+            try:
+                people = await self.bot.xbox.fetch_people_batch(
+                    xuid_list, dont_handle_ratelimit=True
+                )
+            except elytra.MicrosoftAPIException as e:
+                people_json = orjson.loads(await e.resp.aread())
 
-        except elytra.MicrosoftAPIException as e:
-            people_json = orjson.loads(await e.resp.aread())
+                if people_json.get("code"):  # usually means ratelimited or invalid xuid
+                    description: str = people_json["description"]
 
-            if people_json.get("code"):  # usually means ratelimited or invalid xuid
-                description: str = people_json["description"]
+                    if description.startswith("Throttled"):  # ratelimited
+                        raise GamertagOnCooldown() from e
 
-                if description.startswith("Throttled"):  # ratelimited
-                    raise GamertagOnCooldown() from e
+                    # otherwise, usually an invalid xuid - but only trust that if it
+                    # actually names one of ours, or else a generic error would get
+                    # every xuid in the batch marked as invalid
+                    # if it doesn't, the caller falls back to getting them one by one
+                    desc_split = description.split(" ")
+                    if len(desc_split) <= 1 or desc_split[1] not in xuid_list:
+                        raise
 
-                # otherwise, invalid xuid
-                desc_split = description.split(" ")
-                xuid_list.remove(desc_split[1])
+                    # after removing, try getting data again
+                    self.invalid_xuids.add(desc_split[1])
+                    xuid_list = [x for x in xuid_list if x != desc_split[1]]
+                    continue
 
-                # after removing, try getting data again
-                return await self.get_gamertags(xuid_list)
+                if people_json.get("limitType"):  # ratelimit
+                    raise GamertagOnCooldown() from e
 
-            if people_json.get("limitType"):  # ratelimit
-                raise GamertagOnCooldown() from e
+                else:
+                    raise
 
-            else:
-                raise
+            self.responses.append(people)
+            self.answered_xuids.update(xuid_list)
+            return
 
-        self.responses.append(people)
+    async def get_gamertags(self, xuid_list: list[str]) -> None:
+        # this endpoint is absolutely op and should rarely fail
+        # franky, we usually don't need the backup thing, but you can't go wrong
+        # having it
+        await self._fetch_people_batch(xuid_list)
         self.index += self.AMOUNT_TO_GET
 
     async def backup_get_gamertags(self) -> None:
@@ -156,11 +176,14 @@ class GamertagHandler:
                         text,
                     )
 
+                    if r.status in {400, 404}:
+                        # openxbl is sure this xuid doesn't exist
+                        self.answered_xuids.add(xuid)
+
             self.index += 1
 
     def _handle_new_gamertag(
         self,
-        pipe: Pipeline,
         xuid: str,
         gamertag: str,
         dict_gamertags: dict[str, GamertagInfo],
@@ -171,14 +194,6 @@ class GamertagHandler:
             return dict_gamertags
 
         dict_gamertags[xuid] = GamertagInfo(gamertag, device)
-
-        pipe.setex(
-            name=f"rpl-xuid-{xuid}", time=utils.EXPIRE_GAMERTAGS_AT, value=gamertag
-        )
-        pipe.setex(
-            name=f"rpl-gt-{gamertag}", time=utils.EXPIRE_GAMERTAGS_AT, value=xuid
-        )
-
         return dict_gamertags
 
     async def _execute_pipeline(self, pipe: Pipeline) -> None:
@@ -229,7 +244,6 @@ class GamertagHandler:
                             device = a_match.device
 
                         dict_gamertags = self._handle_new_gamertag(
-                            pipe,
                             user.xuid,
                             user.gamertag,
                             dict_gamertags,
@@ -248,9 +262,36 @@ class GamertagHandler:
                             continue
 
                         dict_gamertags = self._handle_new_gamertag(
-                            pipe, xuid, gamertag, dict_gamertags
+                            xuid, gamertag, dict_gamertags
                         )
 
+            self.bot.gamertag_store.queue_gamertags(
+                pipe, {xuid: info.gamertag for xuid, info in dict_gamertags.items()}
+            )
+
+            # tombstoned for longer than the ones below, as microsoft told us
+            # outright these are invalid
+            self.bot.gamertag_store.queue_xuid_entries(
+                pipe,
+                dict.fromkeys(self.invalid_xuids, GAMERTAG_TOMBSTONE),
+                utils.EXPIRE_INVALID_XUIDS_AT,
+            )
+
+            # xuids that we did get an answer for but didn't resolve are likely
+            # deleted accounts or the like - tombstone them for a bit so we don't
+            # keep asking about them on every render
+            # the ttl is shorter than normal just in case we're wrong
+            self.bot.gamertag_store.queue_xuid_entries(
+                pipe,
+                dict.fromkeys(
+                    self.answered_xuids.difference(
+                        dict_gamertags.keys(), self.invalid_xuids
+                    ),
+                    GAMERTAG_TOMBSTONE,
+                ),
+                utils.EXPIRE_UNKNOWN_XUIDS_AT,
+            )
+
             # send data to pipeline in background
             self.bot.create_task(self._execute_pipeline(pipe))
         except:
@@ -285,6 +326,68 @@ async def has_autorunning_playerlist_channel(ctx: utils.RealmContext) -> bool:
     return True
 
 
+async def load_realm_stores(bot: utils.RealmBotBase) -> None:
+    """
+    (Re)loads everything the Realm poller keeps in memory about which Realms
+    and players need what. Done on startup and when taking over as leader, as
+    only the leader keeps these up to date with what happens.
+    """
+    bot.offline_realms.clear()
+    bot.dropped_offline_realms.clear()
+    bot.player_watchlist_store.clear()
+    bot.live_playerlist_store.clear()
+    bot.fetch_devices_for.clear()
+
+    if utils.FEATURE("HANDLE_MISSING_REALMS"):
+        for realm_id in await bot.valkey.zrange(utils.MISSING_REALMS_KEY, 0, -1):
+            bot.offline_realms.add(int(realm_id))
+
+    async for config in models.GuildConfig.filter(
+        playerlist_chan__not_isnull=True,
+        realm_id__not_isnull=True,
+        player_watchlist__not_isnull=True,
+    ):
+        # add all player watchlist players to the player watchlist store
+        for player_xuid in config.player_watchlist:
+            bot.player_watchlist_store[f"{config.realm_id}-{player_xuid}"].add(
+                config.guild_id
+            )
+
+    # add info for who has premium features on and has valid premium
+    async for config in models.GuildConfig.filter(
+        Q(premium_code__id__not_isnull=True)
+        & Q(
+            Q(premium_code__expires_at__isnull=True)
+            | Q(
+                premium_code__expires_at__gt=ipy.Timestamp.utcnow()
+                - datetime.timedelta(days=1)
+            )
+        )
+        & Q(realm_id__not_isnull=True)
+    ).prefetch_related("premium_code"):
+        if config.playerlist_chan and config.live_playerlist:
+            bot.live_playerlist_store[config.realm_id].add(config.guild_id)  # type: ignore
+        if config.fetch_devices:
+            bot.fetch_devices_for.add(config.realm_id)
+
+
+async def mark_realms_missing(
+    bot: utils.RealmBotBase,
+    realm_ids: typing.Iterable[int | str],
+    when: datetime.datetime | None = None,
+) -> None:
+    """
+    Notes down that the Realms have gone missing, unless they already were.
+    See Playerlist.handle_missing_warning.
+    """
+    timestamp = (when or datetime.datetime.now(tz=datetime.UTC)).timestamp()
+    await bot.valkey.zadd(
+        utils.MISSING_REALMS_KEY,
+        {str(realm_id): timestamp for realm_id in realm_ids},
+        nx=True,
+    )
+
+
 async def invalidate_premium(
     bot: utils.RealmBotBase,
     config: models.GuildConfig,
@@ -295,6 +398,7 @@ async def invalidate_premium(
     config.fetch_devices = False
     config.live_online_channel = None
     config.reoccurring_leaderboard = None
+    config.webhook_delivery = False
 
     await config.save()
 
@@ -307,227 +411,49 @@ async def invalidate_premium(
             bot.fetch_devices_for.discard(config.realm_id)
 
 
-async def eventually_invalidate(
-    bot: utils.RealmBotBase,
-    config: models.GuildConfig,
-    limit: int = 3,
-) -> None:
-    if not utils.FEATURE("EVENTUALLY_INVALIDATE"):
-        return
-
-    # the idea here is to invalidate autorunners that simply can't be run
-    # there's a bit of generousity here, as the code gives a total of limit tries
-    # before actually doing it
-    num_times = await bot.valkey.incr(f"invalid-playerlist{limit}-{config.guild_id}")
-
-    logger.info(
-        "Increased invalid-playerlist for guild %s to %s/%s.",
-        config.guild_id,
-        num_times,
-        limit,
-    )
-
-    # expire time - one day plus a bit of leeway
-    await bot.valkey.expire(f"invalid-playerlist{limit}-{config.guild_id}", 87400)
-
-    if num_times >= limit:
-        logger.info(
-            "Unlinking guild %s's playerlist with %s/%s invalidations.",
-            config.guild_id,
-            num_times,
-            limit,
-        )
-
-        # ALL of this is just to reset the config so that there's no more
-        # playerlist channel info
-        old_playerlist_chan = config.playerlist_chan
-        config.playerlist_chan = None
-        old_live_playerlist = config.live_playerlist
-        config.live_playerlist = False
-        old_watchlist = config.player_watchlist
-        config.player_watchlist = None
-        config.player_watchlist_role = None
-        config.notification_channels = {}
-        config.reoccurring_leaderboard = None
-        await config.save()
-        await bot.valkey.delete(
-            f"invalid-playerlist3-{config.guild_id}",
-            f"invalid-playerlist7-{config.guild_id}",
-        )
-
-        if config.realm_id and old_watchlist:
-            for player_xuid in old_watchlist:
-                bot.player_watchlist_store[f"{config.realm_id}-{player_xuid}"].discard(
-                    config.guild_id
-                )
-
-        if config.realm_id and old_live_playerlist:
-            bot.live_playerlist_store[config.realm_id].discard(config.guild_id)
-
-        if old_playerlist_chan:
-            with contextlib.suppress(ipy.errors.HTTPException, AttributeError):
-                chan = utils.partial_channel(bot, old_playerlist_chan)
-
-                msg = (
-                    "The playerlist channel has been unlinked as the bot has not been"
-                    " able to properly send messages to it. Please check your"
-                    " permissions, make sure the bot has `View Channel`, `Send"
-                    " Messages`, and `Embed Links` enabled, and then re-set the"
-                    " playerlist channel."
-                )
-
-                await chan.send(msg)
-
-
-# TODO: combine these into one somehow
-async def eventually_invalidate_watchlist(
-    bot: utils.RealmBotBase, config: models.GuildConfig
-) -> None:
-    if not utils.FEATURE("EVENTUALLY_INVALIDATE"):
-        return
-
-    num_times = await bot.valkey.incr(f"invalid-watchlist-{config.guild_id}")
-
-    logger.info(
-        "Increased invalid-watchlist for guild %s to %s/3.",
-        config.guild_id,
-        num_times,
-    )
-
-    await bot.valkey.expire(f"invalid-watchlist-{config.guild_id}", 87400)
-
-    if num_times >= 3:
-        logger.info(
-            "Unlinking watchlist for guild %s with %s/3 invalidations.",
-            config.guild_id,
-            num_times,
-        )
-
-        old_watchlist = config.player_watchlist
-        config.player_watchlist = None
-        config.player_watchlist_role = None
-        old_chan = config.notification_channels.pop("player_watchlist", None)
-        await config.save()
-
-        if config.realm_id and old_watchlist:
-            for player_xuid in old_watchlist:
-                bot.player_watchlist_store[f"{config.realm_id}-{player_xuid}"].discard(
-                    config.guild_id
-                )
+def _device_key(session: models.PlayerSession) -> str:
+    # keyed by session rather than just the xuid - a player rejoining on
+    # another device starts a new session, so stale entries are never read
+    return f"rpl-device-{session.custom_id}"
 
-        if old_chan:
-            with contextlib.suppress(ipy.errors.HTTPException, AttributeError):
-                chan = utils.partial_channel(bot, old_chan)
 
-                msg = (
-                    "The player watchlist players and channel has been unlinked as the"
-                    " bot has not been able to properly send messages to it. Please"
-                    " check your permissions, make sure the bot has `View Channel`,"
-                    " `Send Messages`, and `Embed Links` enabled, and then re-set the"
-                    " watchlist and channel."
-                )
-
-                await chan.send(msg)
-
-
-async def eventually_invalidate_realm_offline(
-    bot: utils.RealmBotBase, config: models.GuildConfig
-) -> None:
-    if not utils.FEATURE("EVENTUALLY_INVALIDATE"):
-        return
-
-    num_times = await bot.valkey.incr(f"invalid-realm-offline-{config.guild_id}")
-
-    logger.info(
-        "Increased invalid-realm-offline for guild %s to %s/3.",
-        config.guild_id,
-        num_times,
-    )
-
-    await bot.valkey.expire(f"invalid-realm-offline-{config.guild_id}", 87400)
-
-    if num_times >= 3:
-        logger.info(
-            "Unlinking Realm Offline for guild %s with %s/3 invalidations.",
-            config.guild_id,
-            num_times,
-        )
-
-        config.realm_offline_role = None
-        old_chan = config.notification_channels.pop("realm_offline", None)
-        await config.save()
-
-        if old_chan:
-            with contextlib.suppress(ipy.errors.HTTPException, AttributeError):
-                chan = utils.partial_channel(bot, old_chan)
-
-                msg = (
-                    "The Realm Offline role and channel has been unlinked as the bot"
-                    " has not been able to properly send messages to it. Please check"
-                    " your permissions, make sure the bot has `View Channel`, `Send"
-                    " Messages`, and `Embed Links` enabled, and then re-set the role"
-                    " and channel."
-                )
-
-                await chan.send(msg)
-
-
-async def eventually_invalidate_reoccurring_lb(
-    bot: utils.RealmBotBase, config: models.GuildConfig
-) -> None:
-    if not utils.FEATURE("EVENTUALLY_INVALIDATE"):
-        return
-
-    num_times = await bot.valkey.incr(f"invalid-realm-reoccurring-lb-{config.guild_id}")
-
-    logger.info(
-        "Increased invalid-reoccurring-lb for guild %s to %s/3.",
-        config.guild_id,
-        num_times,
-    )
-
-    await bot.valkey.expire(f"invalid-realm-reoccurring-lb-{config.guild_id}", 87400)
-
-    if num_times >= 3:
-        logger.info(
-            "Unlinking reoccurring leaderboard for guild %s with %s/3 invalidations.",
-            config.guild_id,
-            num_times,
-        )
+async def _apply_cached_devices(
+    bot: utils.RealmBotBase,
+    session_dict: dict[str, models.PlayerSession],
+    xuids: set[str],
+) -> set[str]:
+    """
+    Fills in devices for the given XUIDs from the device cache.
+    Returns the XUIDs that still need their device fetched.
+    """
+    sessions = [session_dict[xuid] for xuid in xuids if xuid in session_dict]
+    if not sessions:
+        return set()
 
-        config.reoccurring_leaderboard = None
-        old_chan = config.notification_channels.pop("reoccurring_leaderboard", None)
-        await config.save()
+    devices = await bot.valkey.mget([_device_key(session) for session in sessions])
+    missing: set[str] = set()
 
-        if old_chan:
-            with contextlib.suppress(ipy.errors.HTTPException, AttributeError):
-                chan = utils.partial_channel(bot, old_chan)
+    for session, device in zip(sessions, devices, strict=True):
+        if device is None:
+            missing.add(session.xuid)
+            continue
 
-                msg = (
-                    "The reoccurring leaderboard settings and channel has been unlinked"
-                    " as the bot has not been able to properly send messages to it."
-                    " Please check your permissions, make sure the bot has `View"
-                    " Channel`, `Send Messages`, and `Embed Links` enabled, and then"
-                    " re-set the settings and channel."
-                )
+        # an empty string means we checked and there was no device to show
+        session.device = device or None
 
-                await chan.send(msg)
+    return missing
 
 
-async def eventually_invalidate_live_online(
+async def _cache_devices(
     bot: utils.RealmBotBase,
-    config: models.GuildConfig,
+    sessions: typing.Iterable[models.PlayerSession],
 ) -> None:
-    if not utils.FEATURE("EVENTUALLY_INVALIDATE"):
-        return
-
-    num_times = await bot.valkey.incr(f"invalid-liveonline-{config.guild_id}")
-    await bot.valkey.expire(f"invalid-liveonline-{config.guild_id}", 86400)
-
-    if num_times >= 3:
-        config.live_online_channel = None
-        await config.save()
-        await bot.valkey.delete(f"invalid-liveonline-{config.guild_id}")
+    async with bot.valkey.pipeline() as pipe:
+        for session in sessions:
+            pipe.setex(
+                _device_key(session), utils.EXPIRE_DEVICES_AT, session.device or ""
+            )
+        await pipe.execute()
 
 
 async def fill_in_gamertags_for_sessions(
@@ -541,35 +467,45 @@ async def fill_in_gamertags_for_sessions(
     session_dict = {session.xuid: session for session in player_sessions}
     unresolved: list[str] = []
 
-    if not bypass_cache:
-        session_dict_copy = session_dict.copy()
+    # bypassing the cache is only ever done to get device information,
+    # so anyone whose device we got recently can go through the cache
+    if bypass_cache:
+        bypass_cache_for = set(session_dict.keys())
+    if bypass_cache_for:
+        bypass_cache_for = await _apply_cached_devices(
+            bot, session_dict, bypass_cache_for
+        )
 
-        if bypass_cache_for:
-            for xuid in bypass_cache_for:
-                unresolved.append(xuid)
+    bypass_cache_for = bypass_cache_for or set()
+    session_dict_copy = session_dict.copy()
+
+    for xuid in bypass_cache_for:
+        session_dict_copy.pop(xuid, None)
+
+    if gamertag_map:
+        for xuid, gamertag in gamertag_map.items():
+            if gamertag and xuid in session_dict_copy:
+                session_dict[xuid].gamertag = gamertag
                 session_dict_copy.pop(xuid, None)
 
-        if gamertag_map:
-            for xuid, gamertag in gamertag_map.items():
-                if gamertag and xuid in session_dict_copy:
-                    session_dict[xuid].gamertag = gamertag
-                    session_dict_copy.pop(xuid, None)
+    # the bypassed xuids are read too, but only to skip ones known not to resolve
+    # - asking about those would just make us split batches again
+    xuids_to_read = [*session_dict_copy.keys(), *bypass_cache_for]
+    gamertag_list = await bot.gamertag_store.get_gamertags(xuids_to_read)
 
-        async with bot.valkey.pipeline() as pipeline:
-            for session in session_dict_copy.values():
-                pipeline.get(f"rpl-xuid-{session.xuid}")
+    for xuid, gamertag in zip(xuids_to_read, gamertag_list, strict=True):
+        if gamertag == GAMERTAG_TOMBSTONE:
+            # known to not resolve, so display the xuid as-is
+            continue
 
-            gamertag_list: list[str | None] = await pipeline.execute()
+        if xuid in bypass_cache_for:
+            unresolved.append(xuid)
+            continue
 
-        for index, xuid in enumerate(session_dict_copy.keys()):
-            gamertag = gamertag_list[index]
-            session_dict[xuid].gamertag = gamertag
+        session_dict[xuid].gamertag = gamertag
 
-            if not gamertag:
-                unresolved.append(xuid)
-    else:
-        unresolved = list(session_dict.keys())
-        bypass_cache_for = set(unresolved)
+        if not gamertag:
+            unresolved.append(xuid)
 
     if unresolved:
         gamertag_handler = GamertagHandler(
@@ -577,7 +513,7 @@ async def fill_in_gamertags_for_sessions(
             bot.pl_sem,
             tuple(unresolved),
             bot.openxbl_session,
-            gather_devices_for=bypass_cache_for or set(),
+            gather_devices_for=bypass_cache_for,
         )
         gamertag_dict = await gamertag_handler.run()
 
@@ -586,9 +522,48 @@ async def fill_in_gamertags_for_sessions(
                 session_dict[xuid].gamertag = gamertag_info.gamertag
             session_dict[xuid].device = gamertag_info.device
 
+        if bypass_cache_for:
+            await _cache_devices(
+                bot,
+                (
+                    session_dict[xuid]
+                    for xuid in bypass_cache_for
+                    if xuid in gamertag_dict
+                ),
+            )
+
     return list(session_dict.values())
 
 
+async def prefetch_devices(
+    bot: utils.RealmBotBase, player_sessions: list[models.PlayerSession]
+) -> None:
+    """
+    Fetches and caches device information for players who just joined,
+    so that later renders can use the cache instead of going to Xbox.
+    """
+    try:
+        await fill_in_gamertags_for_sessions(
+            bot,
+            player_sessions,
+            bypass_cache_for={session.xuid for session in player_sessions},
+        )
+    except Exception as e:
+        await utils.error_handle(e)
+
+
+def nickname_fingerprint(
+    nicknames: dict[str, str], xuids: typing.Iterable[str]
+) -> tuple[tuple[str, str], ...]:
+    """
+    Gets the nicknames that apply to the given XUIDs in a hashable form.
+    Two guilds with the same fingerprint will render the same players identically.
+    """
+    if not nicknames:
+        return ()
+    return tuple(sorted((xuid, nicknames[xuid]) for xuid in xuids if xuid in nicknames))
+
+
 async def get_xuid_to_gamertag_map(
     bot: utils.RealmBotBase,
     xuid_list: list[str],
@@ -597,15 +572,14 @@ async def get_xuid_to_gamertag_map(
 
     unresolved: list[str] = []
 
-    async with bot.valkey.pipeline() as pipeline:
-        for xuid in xuid_list:
-            pipeline.get(f"rpl-xuid-{xuid}")
-
-        gamertag_list: list[str | None] = await pipeline.execute()
+    gamertag_list = await bot.gamertag_store.get_gamertags(xuid_list)
 
     for index, xuid in enumerate(xuid_list):
         gamertag = gamertag_list[index]
 
+        if gamertag == GAMERTAG_TOMBSTONE:
+            continue
+
         if not gamertag:
             unresolved.append(xuid)
             continue
@@ -628,10 +602,13 @@ async def get_xuid_to_gamertag_map(
 
 
 async def gamertag_from_xuid(bot: utils.RealmBotBase, xuid: str | int) -> str:
-    if gamertag := await bot.valkey.get(f"rpl-xuid-{xuid}"):
+    if gamertag := await bot.gamertag_store.get_gamertag(xuid):
+        if gamertag == GAMERTAG_TOMBSTONE:
+            raise ipy.errors.BadArgument(f"`{xuid}` is not a valid XUID.")
         return gamertag
 
     maybe_gamertag: elytra.ProfileResponse | None = None
+    openxbl_status: int | None = None
 
     with contextlib.suppress(
         aiohttp.ClientResponseError,
@@ -645,6 +622,8 @@ async def gamertag_from_xuid(bot: utils.RealmBotBase, xuid: str | int) -> str:
         async with bot.openxbl_session.get(
             f"https://xbl.io/api/v2/account/{xuid}"
         ) as r:
+            openxbl_status = r.status
+
             try:
                 r.raise_for_status()
                 maybe_gamertag = await elytra.ProfileResponse.from_response(r)
@@ -663,30 +642,25 @@ async def gamertag_from_xuid(bot: utils.RealmBotBase, xuid: str | int) -> str:
                 )
 
     if not maybe_gamertag:
+        if openxbl_status in {400, 404}:
+            async with bot.valkey.pipeline() as pipe:
+                bot.gamertag_store.queue_xuid_entries(
+                    pipe, {str(xuid): GAMERTAG_TOMBSTONE}, utils.EXPIRE_UNKNOWN_XUIDS_AT
+                )
+                await pipe.execute()
         raise ipy.errors.BadArgument(f"`{xuid}` is not a valid XUID.")
 
     gamertag = next(
         s.value for s in maybe_gamertag.profile_users[0].settings if s.id == "Gamertag"
     )
 
-    async with bot.valkey.pipeline() as pipe:
-        pipe.setex(
-            name=f"rpl-xuid-{xuid}",
-            time=utils.EXPIRE_GAMERTAGS_AT,
-            value=gamertag,
-        )
-        pipe.setex(
-            name=f"rpl-gt-{gamertag}",
-            time=utils.EXPIRE_GAMERTAGS_AT,
-            value=str(xuid),
-        )
-        await pipe.execute()
+    await bot.gamertag_store.set_gamertags({str(xuid): gamertag})
 
     return gamertag
 
 
 async def xuid_from_gamertag(bot: utils.RealmBotBase, gamertag: str) -> str:
-    if xuid := await bot.valkey.get(f"rpl-gt-{gamertag}"):
+    if xuid := await bot.gamertag_store.get_xuid(gamertag):
         return xuid
 
     maybe_xuid: elytra.ProfileResponse | None = None
@@ -713,17 +687,6 @@ async def xuid_from_gamertag(bot: utils.RealmBotBase, gamertag: str) -> str:
 
     xuid = maybe_xuid.profile_users[0].id
 
-    async with bot.valkey.pipeline() as pipe:
-        pipe.setex(
-            name=f"rpl-xuid-{xuid}",
-            time=utils.EXPIRE_GAMERTAGS_AT,
-            value=gamertag,
-        )
-        pipe.setex(
-            name=f"rpl-gt-{gamertag}",
-            time=utils.EXPIRE_GAMERTAGS_AT,
-            value=str(xuid),
-        )
-        await pipe.execute()
+    await bot.gamertag_store.set_gamertags({str(xuid): gamertag})
 
     return xuid
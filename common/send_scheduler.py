@@ -0,0 +1,311 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import enum
+import heapq
+import itertools
+import logging
+import statistics
+import time
+import typing
+from collections import defaultdict, deque
+
+import attrs
+import interactions as ipy
+from interactions.api.http.http_client import GlobalLock
+from interactions.api.http.route import Route
+
+import common.utils as utils
+
+T = typing.TypeVar("T")
+
+logger = logging.getLogger("realms_bot")
+
+# lower priority sends leave this many requests of the global ratelimit alone,
+# so time-sensitive messages always have some room to go out
+GLOBAL_RESERVE = 10
+
+# ipy doesn't tell us when an exhausted bucket resets, so check back this often
+BUCKET_RECHECK_DELAY = 0.25
+
+
+def _has_global_lock_internals() -> bool:
+    # ipy keeps the global ratelimit state private - make sure it still looks like
+    # what we expect, rather than misbehaving without a word after an upgrade
+    lock = GlobalLock()
+    return isinstance(getattr(lock, "_reset_time", None), int | float) and isinstance(
+        getattr(lock, "_calls", None), int
+    )
+
+
+GLOBAL_LOCK_INTERNALS = _has_global_lock_internals()
+if not GLOBAL_LOCK_INTERNALS:
+    logger.warning(
+        "interactions.py@%s's global ratelimit internals have changed - low priority"
+        " sends won't leave room for others.",
+        ipy.__version__,
+    )
+
+
+class SendPriority(enum.IntEnum):
+    LIVE = 0
+    WATCHLIST = 1
+    OFFLINE = 2
+    AUTORUNNER = 3
+    LEADERBOARD = 4
+
+
+@attrs.define(order=False)
+class _Job:
+    priority: SendPriority = attrs.field()
+    seq: int = attrs.field()
+    func: typing.Callable[[], typing.Awaitable[typing.Any]] = attrs.field()
+    future: asyncio.Future = attrs.field()
+    enqueued_at: float = attrs.field()
+    on_start: typing.Callable[[], None] | None = attrs.field(default=None)
+
+    def __lt__(self, other: "_Job") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+@attrs.define()
+class SendScheduler:
+    """
+    Schedules outgoing messages so that more important ones go out first.
+
+    Each channel has its own queue, and sends to the same channel are done one
+    at a time. Between channels, the one with the most important pending send
+    is picked next. Channels whose ratelimit bucket is exhausted are set aside
+    until it resets rather than holding up a worker.
+    """
+
+    bot: "utils.RealmBotBase" = attrs.field()
+    concurrency: int = attrs.field(default=10, kw_only=True)
+
+    _queues: dict[int, list[_Job]] = attrs.field(init=False, factory=dict)
+    _ready: list[tuple[int, int, int]] = attrs.field(init=False, factory=list)
+    _busy: set[int] = attrs.field(init=False, factory=set)
+    _seq: itertools.count = attrs.field(init=False, factory=itertools.count)
+    _wakeup: asyncio.Event = attrs.field(init=False, factory=asyncio.Event)
+    _workers: list[asyncio.Task] = attrs.field(init=False, factory=list)
+
+    waits: defaultdict[SendPriority, deque[float]] = attrs.field(
+        init=False, factory=lambda: defaultdict(lambda: deque(maxlen=1000))
+    )
+    sent: defaultdict[SendPriority, int] = attrs.field(
+        init=False, factory=lambda: defaultdict(int)
+    )
+
+    def start(self) -> None:
+        self._workers = [
+            self.bot.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+
+    def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    async def submit(
+        self,
+        channel_id: ipy.Snowflake_Type,
+        priority: SendPriority,
+        func: typing.Callable[[], typing.Awaitable[T]],
+        *,
+        on_start: typing.Callable[[], None] | None = None,
+    ) -> T:
+        """
+        Queues up a request to a channel and waits for it to be done.
+
+        Args:
+            channel_id: The channel the request is for.
+            priority: How important the request is.
+            func: A function that makes the request when called.
+            on_start: Called right before the request is made. If waiting for this
+                is cancelled before then, the request is never made.
+
+        Returns:
+            Whatever the request returned.
+        """
+        channel_id = int(channel_id)
+
+        job = _Job(
+            priority,
+            next(self._seq),
+            func,
+            asyncio.get_running_loop().create_future(),
+            time.perf_counter(),
+            on_start,
+        )
+        queue = self._queues.setdefault(channel_id, [])
+        heapq.heappush(queue, job)
+
+        if channel_id not in self._busy and queue[0] is job:
+            heapq.heappush(self._ready, (job.priority, job.seq, channel_id))
+            self._wakeup.set()
+
+        return await job.future
+
+    async def send(
+        self,
+        channel_id: ipy.Snowflake_Type,
+        priority: SendPriority,
+        *args: typing.Any,
+        **kwargs: typing.Any,
+    ) -> ipy.Message:
+        chan = utils.partial_channel(self.bot, channel_id)
+        return await self.submit(
+            channel_id, priority, lambda: chan.send(*args, **kwargs)
+        )
+
+    async def send_payload(
+        self,
+        channel_id: ipy.Snowflake_Type,
+        priority: SendPriority,
+        payload: dict,
+        *,
+        on_start: typing.Callable[[], None] | None = None,
+    ) -> dict:
+        """Sends an already built message payload, skipping ipy's processing of it."""
+        return await self.submit(
+            channel_id,
+            priority,
+            lambda: self.bot.http.create_message(payload, channel_id),
+            on_start=on_start,
+        )
+
+    async def edit(
+        self,
+        message: ipy.Message,
+        priority: SendPriority,
+        **kwargs: typing.Any,
+    ) -> ipy.Message:
+        return await self.submit(
+            message._channel_id, priority, lambda: message.edit(**kwargs)
+        )
+
+    async def _next_channel(self) -> int:
+        while True:
+            while self._ready:
+                _, seq, channel_id = heapq.heappop(self._ready)
+                queue = self._queues.get(channel_id)
+
+                # entries go stale once their job has been run
+                if channel_id in self._busy or not queue or queue[0].seq != seq:
+                    continue
+                return channel_id
+
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def _global_reserve_wait(self) -> float:
+        """
+        Gets how long until the global ratelimit has more than the reserve left.
+        All of ipy's private state is read here, and nowhere else.
+        """
+        if not GLOBAL_LOCK_INTERNALS:
+            return 0.0
+
+        global_lock = self.bot.http.global_lock
+        now = time.perf_counter()
+        # _calls counts down how many calls are left until _reset_time
+        if global_lock._reset_time > now and global_lock._calls < GLOBAL_RESERVE:
+            return global_lock._reset_time - now
+        return 0.0
+
+    def _throttled_for(self, channel_id: int, priority: SendPriority) -> float:
+        bucket = self.bot.http.get_ratelimit(
+            Route("POST", "/channels/{channel_id}/messages", channel_id=channel_id)
+        )
+        # delta is how long was left as of the last response, not now - so
+        # check back in a bit rather than trusting it
+        if bucket.locked and bucket.remaining == 0:
+            return BUCKET_RECHECK_DELAY
+
+        if priority >= SendPriority.AUTORUNNER:
+            return self._global_reserve_wait()
+
+        return 0.0
+
+    def retry_after(self, channel_id: ipy.Snowflake_Type) -> float:
+        """Gets how long until a low priority send to the channel could go out."""
+        return self._throttled_for(int(channel_id), SendPriority.AUTORUNNER)
+
+    def _release(self, channel_id: int) -> None:
+        self._busy.discard(channel_id)
+
+        if queue := self._queues.get(channel_id):
+            heapq.heappush(self._ready, (queue[0].priority, queue[0].seq, channel_id))
+            self._wakeup.set()
+        else:
+            self._queues.pop(channel_id, None)
+
+    async def _worker(self) -> None:
+        while True:
+            channel_id = await self._next_channel()
+            queue = self._queues[channel_id]
+            job = queue[0]
+            self._busy.add(channel_id)
+
+            if delay := self._throttled_for(channel_id, job.priority):
+                asyncio.get_running_loop().call_later(delay, self._release, channel_id)
+                continue
+
+            heapq.heappop(queue)
+
+            # whoever queued this up stopped waiting for it
+            if job.future.done():
+                self._release(channel_id)
+                continue
+
+            self.waits[job.priority].append(time.perf_counter() - job.enqueued_at)
+            self.sent[job.priority] += 1
+
+            try:
+                if job.on_start:
+                    job.on_start()
+                result = await job.func()
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._release(channel_id)
+
+    def stats(self) -> dict[SendPriority, dict[str, float]]:
+        """Gets the queue depth and how long sends waited for each priority."""
+        queued: defaultdict[SendPriority, int] = defaultdict(int)
+        for queue in self._queues.values():
+            for job in queue:
+                queued[job.priority] += 1
+
+        output: dict[SendPriority, dict[str, float]] = {}
+        for priority in SendPriority:
+            waits = sorted(self.waits[priority])
+            output[priority] = {
+                "queued": queued[priority],
+                "sent": self.sent[priority],
+                "avg_wait": statistics.fmean(waits) if waits else 0.0,
+                "p95_wait": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                "max_wait": waits[-1] if waits else 0.0,
+            }
+        return output
@@ -20,6 +20,7 @@ import typing
 from collections import Counter, defaultdict
 from enum import IntEnum
 
+import humanize
 import interactions as ipy
 
 import common.graph_template as graph_template
@@ -301,6 +302,52 @@ def calc_leaderboard(
     return [e for e in leaderboard_counter.most_common() if e[0]]
 
 
+def calc_leaderboards[T: typing.Hashable](
+    ranges: typing.Iterable[GatherDatetimesReturn],
+    min_datetimes: dict[T, datetime.datetime],
+) -> dict[T, list[tuple[str, int]]]:
+    """
+    Like calc_leaderboard, but for several periods over the same data at once.
+    `min_datetimes` maps each key to how far back its leaderboard goes.
+    """
+    counters: dict[T, Counter[str]] = {key: Counter() for key in min_datetimes}
+
+    for datetime_entry in ranges:
+        timespan = calc_timespan(datetime_entry.joined_at, datetime_entry.last_seen)
+        for key, min_datetime in min_datetimes.items():
+            if datetime_entry.joined_at >= min_datetime:
+                counters[key][datetime_entry.xuid] += timespan
+
+    return {
+        key: [e for e in (+counter).most_common() if e[0]]
+        for key, counter in counters.items()
+    }
+
+
+def format_leaderboard(
+    leaderboard: list[tuple[str, int]],
+    gamertag_map: dict[str, str],
+    nicknames: dict[str, str],
+) -> str:
+    leaderboard_builder: list[str] = []
+
+    for index, (xuid, playtime) in enumerate(leaderboard):
+        precisedelta = humanize.precisedelta(
+            playtime, minimum_unit="minutes", format="%0.0f"
+        )
+
+        if precisedelta == "1 minutes":  # why humanize
+            precisedelta = "1 minute"
+
+        display = models.display_gamertag(
+            xuid, gamertag_map.get(xuid), nicknames.get(xuid), markdown="**"
+        )
+
+        leaderboard_builder.append(f"**{index+1}\\.** {display}: {precisedelta}")
+
+    return "\n".join(leaderboard_builder)
+
+
 async def gather_datetimes(
     config: models.GuildConfig,
     min_datetime: datetime.datetime,
@@ -333,6 +380,25 @@ async def gather_datetimes(
     return datetimes_to_use
 
 
+async def gather_realm_datetimes(
+    realm_ids: typing.Iterable[str],
+    min_datetime: datetime.datetime,
+) -> defaultdict[str, list[GatherDatetimesReturn]]:
+    """Like gather_datetimes, but for many Realms at once, grouped by Realm."""
+    datetimes: defaultdict[str, list[GatherDatetimesReturn]] = defaultdict(list)
+
+    for realm_id, xuid, joined_at, last_seen in await models.PlayerSession.filter(
+        realm_id__in=list(realm_ids),
+        joined_at__gte=min_datetime,
+    ).values_list("realm_id", "xuid", "joined_at", "last_seen"):
+        if joined_at and last_seen:
+            datetimes[realm_id].append(
+                GatherDatetimesReturn(xuid, joined_at, last_seen)
+            )
+
+    return datetimes
+
+
 async def period_parse(
     bot: utils.RealmBotBase,
     user_id: ipy.Snowflake_Type,
@@ -39,6 +39,14 @@ SENTRY_ENABLED = bool(os.environ.get("SENTRY_DSN", False))  # type: ignore
 DEV_GUILD_ID = int(os.environ.get("DEV_GUILD_ID", "0"))
 
 EXPIRE_GAMERTAGS_AT = int(datetime.timedelta(days=7).total_seconds())
+EXPIRE_INVALID_XUIDS_AT = int(datetime.timedelta(days=30).total_seconds())
+EXPIRE_UNKNOWN_XUIDS_AT = int(datetime.timedelta(hours=12).total_seconds())
+EXPIRE_DEVICES_AT = int(datetime.timedelta(minutes=5).total_seconds())
+EXPIRE_WEBHOOKS_AT = int(datetime.timedelta(days=7).total_seconds())
+
+# sorted set of realm id -> when it was first noticed as missing
+MISSING_REALMS_KEY = "rpl-missing-realms"
+WARN_MISSING_REALMS_AFTER = int(datetime.timedelta(days=1).total_seconds())
 
 logger = logging.getLogger("realms_bot")
 
@@ -53,6 +61,7 @@ _debug_defaults = {
     "SECURITY_CHECK": True,
     "RUN_MIGRATIONS_AUTOMATICALLY": True,
     "VOTEGATING": True,
+    "HASH_GAMERTAG_STORE": False,
 }
 
 REOCCURRING_LB_FREQUENCY: dict[int, str] = {
@@ -395,7 +404,14 @@ if typing.TYPE_CHECKING:
     import valkey.asyncio as aiovalkey
 
     from .classes import OrderedSet
+    from .config_cache import GuildConfigCache
+    from .dispatch import DispatchJob
+    from .fair_queue import RealmFairQueue
+    from .gamertag_store import GamertagStore
     from .help_tools import MiniCommand, PermissionsResolver
+    from .invalidation import InvalidationCounter
+    from .leader import LeaderLease
+    from .send_scheduler import SendPriority, SendScheduler
 
     class RealmBotBase(ipy.AutoShardedClient):
         prefixed: prefixed.PrefixedManager
@@ -412,6 +428,12 @@ if typing.TYPE_CHECKING:
         xbox: elytra.XboxAPI
         realms: elytra.BedrockRealmsAPI
         valkey: aiovalkey.Valkey
+        gamertag_store: GamertagStore
+        config_cache: GuildConfigCache
+        send_scheduler: SendScheduler
+        invalidations: InvalidationCounter
+        live_playerlist_queue: RealmFairQueue
+        leader: LeaderLease
         own_gamertag: str
         background_tasks: set[asyncio.Task]
 
@@ -439,6 +461,7 @@ else:
 class RealmContextMixin:
     config: GuildConfig | None
     guild_id: ipy.Snowflake
+    client: RealmBotBase
 
     def __init__(self, *args: typing.Any, **kwargs: typing.Any) -> None:
         self.config = None
@@ -457,8 +480,8 @@ class RealmContextMixin:
         if self.config:
             return self.config
 
-        config = await GuildConfig.get_or_none(guild_id=self.guild_id).prefetch_related(
-            "premium_code"
+        config = await self.client.config_cache.fetch(
+            self.guild_id
         ) or await GuildConfig.create(guild_id=self.guild_id, notification_channels={})
         self.config = config
         return config
@@ -485,6 +508,11 @@ class RealmModalContext(RealmContextMixin, ipy.ModalContext[RealmBotBase]):
 
 
 class RealmPrefixedContext(RealmContextMixin, prefixed.PrefixedContext[RealmBotBase]):
+    # set by the autorunners so that their logs go out with the right priority
+    send_priority: "SendPriority | None" = None
+    # and this so that they know what's already been sent if they're retried
+    dispatch_job: "DispatchJob | None" = None
+
     @property
     def channel(self) -> ipy.GuildText:
         """The channel this context was invoked in."""
@@ -0,0 +1,144 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+# an opt-in way for premium servers to get live playerlist and autorunner messages
+# out - webhooks have their own ratelimit bucket, separate from the one the bot
+# shares with everything else it sends to a channel
+
+import asyncio
+import contextlib
+import typing
+import weakref
+
+import interactions as ipy
+
+import common.invalidation as invalidation
+import common.models as models
+import common.send_scheduler as send_scheduler
+import common.utils as utils
+
+WEBHOOK_NAME = "Realms Playerlist Bot"
+
+# weak, so locks go away once nothing's waiting on them
+_locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+def _webhook_key(channel_id: ipy.Snowflake_Type) -> str:
+    return f"rpl-webhook-{channel_id}"
+
+
+async def fetch_webhook(
+    bot: utils.RealmBotBase, channel_id: ipy.Snowflake_Type
+) -> tuple[str, str]:
+    """
+    Gets the bot's webhook for a channel, making one if it doesn't exist.
+    Returns the ID and token of the webhook.
+    """
+    channel_id = int(channel_id)
+
+    if webhook := await bot.valkey.get(_webhook_key(channel_id)):
+        webhook_id, token = webhook.split("|", 1)
+        return webhook_id, token
+
+    # the live playerlist and autorunner can both end up here at the same time,
+    # and we don't want to make two webhooks for the same channel
+    async with _locks.setdefault(channel_id, asyncio.Lock()):
+        if webhook := await bot.valkey.get(_webhook_key(channel_id)):
+            webhook_id, token = webhook.split("|", 1)
+            return webhook_id, token
+
+        data = next(
+            (
+                w
+                for w in await bot.http.get_channel_webhooks(channel_id)
+                if w.get("token") and w.get("user", {}).get("id") == str(bot.user.id)
+            ),
+            None,
+        )
+        if not data:
+            data = await bot.http.create_webhook(channel_id, WEBHOOK_NAME)
+
+        webhook_id, token = str(data["id"]), data["token"]
+        await bot.valkey.setex(
+            _webhook_key(channel_id),
+            utils.EXPIRE_WEBHOOKS_AT,
+            f"{webhook_id}|{token}",
+        )
+        return webhook_id, token
+
+
+async def forget_webhook(
+    bot: utils.RealmBotBase,
+    channel_id: ipy.Snowflake_Type,
+    *,
+    delete: bool = False,
+) -> None:
+    webhook = await bot.valkey.getdel(_webhook_key(channel_id))
+
+    if delete and webhook:
+        webhook_id, token = webhook.split("|", 1)
+        with contextlib.suppress(ipy.errors.HTTPException):
+            await bot.http.delete_webhook(webhook_id, token)
+
+
+async def send_payload(
+    bot: utils.RealmBotBase,
+    config: models.GuildConfig,
+    channel_id: ipy.Snowflake_Type,
+    priority: send_scheduler.SendPriority,
+    payload: dict[str, typing.Any],
+    *,
+    on_start: typing.Callable[[], None] | None = None,
+) -> None:
+    """
+    Sends an already built message payload to a channel, through the channel's
+    webhook if the server has webhook delivery on.
+
+    If the webhook can't be made or has been deleted, this falls back to sending
+    the message normally. Any other errors are for the caller to handle.
+    `on_start` is called right before the message is actually sent.
+    """
+    if config.webhook_delivery and config.valid_premium:
+        try:
+            webhook_id, token = await fetch_webhook(bot, channel_id)
+        except ipy.errors.HTTPException as e:
+            if e.status < 500:
+                bot.invalidations.add(invalidation.Invalidation.WEBHOOK, config)
+        else:
+            try:
+                if on_start:
+                    on_start()
+                await bot.http.execute_webhook(
+                    webhook_id,
+                    token,
+                    payload | {
+                        "username": bot.user.username,
+                        "avatar_url": bot.user.display_avatar.url,
+                    },
+                )
+                return
+            except ipy.errors.HTTPException as e:
+                # anything else could've still gone through, so sending it
+                # normally might double up - leave retrying to the caller
+                if e.status not in {401, 404}:
+                    raise
+
+                # the webhook was deleted - we'll make a new one next time
+                await forget_webhook(bot, channel_id)
+
+    await bot.send_scheduler.send_payload(
+        channel_id, priority, payload, on_start=on_start
+    )
@@ -16,19 +16,53 @@ Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
 
 import asyncio
 import contextlib
+import copy
 import datetime
+import functools
 import importlib
+import logging
+import os
+import time
+import typing
+from collections import defaultdict, deque
 
+import attrs
 import interactions as ipy
 from pypika import Order, PostgreSQLQuery, Table
+from tortoise import connections
 from tortoise.expressions import Q
 
 import common.classes as cclasses
+import common.dispatch as dispatch
+import common.embed_templates as embed_templates
+import common.invalidation as invalidation
 import common.models as models
 import common.playerlist_events as pl_events
 import common.playerlist_utils as pl_utils
+import common.send_scheduler as send_scheduler
+import common.stats_utils as stats_utils
 import common.utils as utils
 
+logger = logging.getLogger("realms_bot")
+
+PURGE_BATCH_SIZE = 5000
+PURGE_BATCH_PAUSE = 0.5
+
+# ctid is the physical location of a row, so = ANY(ARRAY(...)) lets postgres
+# go straight to each row rather than scanning for them again
+# (keep DELETE at the very start - tortoise only reports the row count then)
+PURGE_BATCH_QUERY = """DELETE FROM "realmplayersession" WHERE ctid = ANY(ARRAY(
+    SELECT ctid FROM "realmplayersession"
+    WHERE "online" = false AND "last_seen" < $1
+    LIMIT $2
+))
+"""
+
+STALE_ONLINE_QUERY = """UPDATE "realmplayersession" SET "online" = false
+WHERE "online" = true AND "last_seen" < $1
+RETURNING "realm_id", "xuid"
+"""
+
 UPSELLS = [
     (
         "Want minute-to-minute updates on your Realm? Do you want device information"
@@ -56,6 +90,11 @@ if utils.VOTING_ENABLED:
 
 LENGTH_UPSELLS = len(UPSELLS)
 
+# how long (in seconds) the hourly playerlist is spread out over, and how many
+# guilds can have theirs running at once
+AUTORUNNER_WINDOW = float(os.environ.get("AUTORUNNER_WINDOW", "120"))
+AUTORUNNER_CONCURRENCY = int(os.environ.get("AUTORUNNER_CONCURRENCY", "25"))
+
 
 def upsell_determiner(dt: datetime.datetime) -> str | None:
     if dt.hour % 6 == 0:
@@ -66,6 +105,17 @@ def upsell_determiner(dt: datetime.datetime) -> str | None:
     return None
 
 
+@attrs.define(kw_only=True)
+class PreparedPlayerlist:
+    configs: list[models.GuildConfig] = attrs.field()
+    # realm id -> xuid -> session
+    sessions: defaultdict[str, dict[str, models.PlayerSession]] = attrs.field()
+    gamertag_map: defaultdict[str, str] = attrs.field()
+    prepared_at: datetime.datetime = attrs.field()
+    # what the log is for - the same for every guild, however late they're sent
+    log_time: datetime.datetime = attrs.field()
+
+
 def period_determiner(period_index: int) -> int:
     match period_index:
         case 1:
@@ -87,6 +137,7 @@ class Autorunners(utils.Extension):
 
     def __init__(self, bot: utils.RealmBotBase) -> None:
         self.bot: utils.RealmBotBase = bot
+        self.playerlist_runs: deque[dispatch.DispatchStats] = deque(maxlen=24)
         self.playerlist_task = self.bot.create_task(self._start_playerlist())
         self.reoccuring_lb_task = self.bot.create_task(self._start_reoccurring_lb())
         self.player_session_delete.start()
@@ -97,6 +148,17 @@ class Autorunners(utils.Extension):
         self.player_session_delete.stop()
         super().drop()
 
+    def present_configs(
+        self, predicate: typing.Callable[[models.GuildConfig], bool]
+    ) -> list[models.GuildConfig]:
+        """Gets the configs of guilds the bot is in that match the predicate."""
+        # filtered in memory, rather than sending every guild the bot is in to
+        # the database as one giant IN list
+        guild_ids = {int(g) for g in self.bot.user._guild_ids}
+        return self.bot.config_cache.filter(
+            lambda c: c.guild_id in guild_ids and predicate(c)
+        )
+
     async def _start_playerlist(self) -> None:
         await self.bot.fully_ready.wait()
 
@@ -106,50 +168,68 @@ class Autorunners(utils.Extension):
                 now = ipy.Timestamp.utcnow() + datetime.timedelta(milliseconds=1)
                 next_time = now.replace(minute=59, second=59, microsecond=0)
 
-                # yes, next_time could be in the past, but that's handled by sleep_until
+                # do the heavy lifting a bit early, so all that's left at the top
+                # of the hour is catching up with the last minute or two
+                # yes, these could be in the past, but that's handled by sleep_until
+                await utils.sleep_until(next_time.replace(minute=58, second=0))
+
+                prepared: PreparedPlayerlist | None = None
+                if self.bot.leader.is_leader:
+                    try:
+                        prepared = await self.prepare_playerlist(
+                            next_time + datetime.timedelta(seconds=1)
+                        )
+                    except Exception as e:
+                        if isinstance(e, asyncio.CancelledError):
+                            raise
+                        # we can still do it all at the top of the hour
+                        await utils.error_handle(e)
+
                 await utils.sleep_until(next_time)
 
+                # another process is sending these out - wait until we're past
+                # the hour, or we'd just work out the same time all over again
+                if not await self.bot.leader.still_leader():
+                    await utils.sleep_until(next_time + datetime.timedelta(seconds=1))
+                    continue
+
                 # wait for the playerlist to finish parsing
                 with contextlib.suppress(asyncio.TimeoutError):
                     await self.bot.wait_for(pl_events.PlayerlistParseFinish, timeout=15)
 
-                await self.playerlist_loop(upsell=upsell_determiner(next_time))
+                await self.playerlist_loop(
+                    upsell=upsell_determiner(next_time), prepared=prepared
+                )
             except Exception as e:
                 if not isinstance(e, asyncio.CancelledError):
                     await utils.error_handle(e)
                 else:
                     return
 
-    async def playerlist_loop(
-        self,
-        upsell: str | None,
-    ) -> None:
+    async def prepare_playerlist(
+        self, log_time: datetime.datetime
+    ) -> PreparedPlayerlist | None:
         """
-        A simple way of running the playerlist command every hour in every server the bot is in.
+        Gets everything the hourly playerlist needs for the hour ending at
+        `log_time`, other than the rendering itself.
         """
-
-        list_cmd = next(
-            c for c in self.bot.application_commands if str(c.name) == "playerlist"
+        configs = self.present_configs(
+            lambda c: not c.live_playerlist
+            and c.realm_id is not None
+            and c.playerlist_chan is not None
         )
-
-        configs = await models.GuildConfig.filter(
-            guild_id__in=[int(g) for g in self.bot.user._guild_ids],
-            live_playerlist=False,
-            realm_id__isnull=False,
-            playerlist_chan__isnull=False,
-        ).prefetch_related("premium_code")
         if not configs:
-            return
+            return None
 
         realm_ids = {c.realm_id for c in configs}
-        for config in configs:
-            if config.fetch_devices and config.valid_premium:
-                realm_ids.discard(config.realm_id)
 
-        now = ipy.Timestamp.utcnow().replace(second=30)
-        time_delta = datetime.timedelta(hours=1, minutes=5)
+        # same window as the playerlist command uses for one hour
+        now = log_time.replace(second=30)
+        time_delta = datetime.timedelta(hours=1, minutes=1)
         time_ago = now - time_delta
 
+        # one query for every realm rather than one per guild - distinct on the
+        # realm too, as a player can be on more than one of them
         playersession = Table(models.PlayerSession.Meta.table)
         query = (
             PostgreSQLQuery.from_(playersession)
@@ -161,32 +241,154 @@ class Autorunners(utils.Extension):
                     | playersession.last_seen.gte(time_ago)
                 )
             )
+            .orderby("realm_id", order=Order.asc)
             .orderby("xuid", order=Order.asc)
             .orderby("last_seen", order=Order.desc)
-            .distinct_on("xuid")  # type: ignore
+            .distinct_on("realm_id", "xuid")  # type: ignore
         )
 
+        # taken before the query, so catching up later covers anything that
+        # changed while the rest of this was running
+        prepared_at = datetime.datetime.now(tz=datetime.UTC)
         player_sessions: list[models.PlayerSession] = await models.PlayerSession.raw(
             str(query)
         )  # type: ignore
-        if not player_sessions:
-            return
+
+        sessions: defaultdict[str, dict[str, models.PlayerSession]] = defaultdict(dict)
+        for session in player_sessions:
+            sessions[session.realm_id][session.xuid] = session
 
         gamertag_map = await pl_utils.get_xuid_to_gamertag_map(
-            self.bot, [p.xuid for p in player_sessions]
+            self.bot, list({p.xuid for p in player_sessions})
         )
 
-        to_run = [
-            self.auto_run_playerlist(list_cmd, config, upsell, gamertag_map)
-            for config in configs
+        # warm up the device cache too - copies, as this fills in devices for
+        # sessions shared with guilds that may not want them
+        if device_sessions := [
+            copy.copy(session)
+            for realm_id in realm_ids & self.bot.fetch_devices_for
+            for session in sessions.get(realm_id, {}).values()
+            if session.online
+        ]:
+            await pl_utils.prefetch_devices(self.bot, device_sessions)
+
+        return PreparedPlayerlist(
+            configs=configs,
+            sessions=sessions,
+            gamertag_map=gamertag_map,
+            prepared_at=prepared_at,
+            log_time=log_time,
+        )
+
+    async def catch_up_playerlist(self, prepared: PreparedPlayerlist) -> None:
+        """
+        Applies what changed since the hourly playerlist was prepared - players
+        who joined or left since then.
+        """
+        realm_ids = {c.realm_id for c in prepared.configs}
+
+        joined_ids = [
+            custom_id
+            for realm_id in realm_ids
+            for xuid in self.bot.online_cache.get(int(realm_id), ())
+            if not (
+                (session := prepared.sessions.get(realm_id, {}).get(xuid))
+                and session.online
+            )
+            and (custom_id := self.bot.uuid_cache.get(f"{realm_id}-{xuid}"))
+        ]
+
+        # anyone who left would've been last seen the minute before they left,
+        # hence the leeway
+        delta = await models.PlayerSession.filter(
+            Q(
+                realm_id__in=list(realm_ids),
+                online=False,
+                last_seen__gte=prepared.prepared_at - datetime.timedelta(minutes=1),
+            )
+            | Q(custom_id__in=joined_ids)
+        )
+
+        for session in delta:
+            realm_sessions = prepared.sessions[session.realm_id]
+            existing = realm_sessions.get(session.xuid)
+            if not existing or session.last_seen >= existing.last_seen:
+                realm_sessions[session.xuid] = session
+
+        if unknown_xuids := list(
+            {p.xuid for p in delta if p.xuid not in prepared.gamertag_map}
+        ):
+            prepared.gamertag_map.update(
+                await pl_utils.get_xuid_to_gamertag_map(self.bot, unknown_xuids)
+            )
+
+    async def playerlist_loop(
+        self,
+        upsell: str | None,
+        *,
+        window: float = AUTORUNNER_WINDOW,
+        prepared: PreparedPlayerlist | None = None,
+    ) -> None:
+        """
+        A simple way of running the playerlist command every hour in every server the bot is in.
+        """
+
+        list_cmd = next(
+            c for c in self.bot.application_commands if str(c.name) == "playerlist"
+        )
+
+        if prepared:
+            await self.catch_up_playerlist(prepared)
+        elif not (prepared := await self.prepare_playerlist(ipy.Timestamp.utcnow())):
+            return
+
+        sessions_by_realm = {
+            realm_id: list(realm_sessions.values())
+            for realm_id, realm_sessions in prepared.sessions.items()
+            if realm_sessions
+        }
+
+        render_cache: dict = {}
+        jobs = [
+            dispatch.DispatchJob(
+                key=config.guild_id,
+                channel_id=config.playerlist_chan,
+                func=functools.partial(
+                    self.auto_run_playerlist,
+                    list_cmd,
+                    config,
+                    upsell,
+                    prepared.gamertag_map,
+                    render_cache,
+                    sessions_by_realm[config.realm_id],
+                    log_time=prepared.log_time,
+                ),
+            )
+            for config in prepared.configs
+            if config.realm_id in sessions_by_realm
         ]
+        if not jobs:
+            return
 
-        # why not use a taskgroup? because if we did, if one task errored,
-        # the entire thing would stop and we don't want that
-        output = await asyncio.gather(*to_run, return_exceptions=True)
-        for message in output:
-            if isinstance(message, Exception):
-                await utils.error_handle(message)
+        # sending to every guild at once means thousands of requests at the same
+        # time, so spread them out over a few minutes instead
+        dispatcher = dispatch.StaggeredDispatcher(
+            self.bot, window=window, concurrency=AUTORUNNER_CONCURRENCY
+        )
+        stats = await dispatcher.run(jobs)
+        self.playerlist_runs.append(stats)
+
+        logger.info(
+            "Autorunner: %s/%s completed, %s timed out, %s failed, %s retries, in"
+            " %.2fs (at most %.2fs late).",
+            stats.completed,
+            stats.total,
+            stats.timed_out,
+            stats.failed,
+            stats.retried,
+            stats.duration,
+            stats.max_lateness,
+        )
 
     async def auto_run_playerlist(
         self,
@@ -194,6 +396,11 @@ class Autorunners(utils.Extension):
         config: models.GuildConfig,
         upsell: str | None,
         gamertag_map: dict[str, str],
+        render_cache: dict | None = None,
+        player_sessions: list[models.PlayerSession] | None = None,
+        job: dispatch.DispatchJob | None = None,
+        *,
+        log_time: datetime.datetime | None = None,
     ) -> None:
         if config.guild_id in self.bot.unavailable_guilds:
             return
@@ -204,6 +411,8 @@ class Autorunners(utils.Extension):
         a_ctx.channel_id = ipy.to_snowflake(config.playerlist_chan)
         a_ctx.guild_id = ipy.to_snowflake(config.guild_id)
         a_ctx.config = config  # type: ignore
+        a_ctx.send_priority = send_scheduler.SendPriority.AUTORUNNER
+        a_ctx.dispatch_job = job
 
         a_ctx.prefix = ""
         a_ctx.content_parameters = ""
@@ -216,20 +425,22 @@ class Autorunners(utils.Extension):
         # and also make it so it doesnt go back 12 hours, instead only going one
         # and yes, add the upsell info
 
+        # the dispatcher handles timing this out and retrying
         try:
-            await asyncio.wait_for(
-                list_cmd.callback(
-                    a_ctx,
-                    1,
-                    autorunner=True,
-                    upsell=upsell,
-                    gamertag_map=gamertag_map,
-                ),
-                timeout=60,
+            await list_cmd.callback(
+                a_ctx,
+                1,
+                autorunner=True,
+                upsell=upsell,
+                gamertag_map=gamertag_map,
+                render_cache=render_cache,
+                player_sessions=player_sessions,
+                log_time=log_time,
             )
         except ipy.errors.HTTPException as e:
-            if e.status < 500:
-                await pl_utils.eventually_invalidate(self.bot, config)
+            if e.status >= 500 or e.status == 429:
+                raise
+            self.bot.invalidations.add(invalidation.Invalidation.PLAYERLIST, config)
 
     async def _start_reoccurring_lb(self) -> None:
         await self.bot.fully_ready.wait()
@@ -242,6 +453,12 @@ class Autorunners(utils.Extension):
                     hour=0, minute=0, second=0, microsecond=0
                 ) + datetime.timedelta(days=1)
 
+                await utils.sleep_until(tomorrow)
+
+                # another process is sending these out - and toggling the bit below
+                if not await self.bot.leader.still_leader():
+                    continue
+
                 if tomorrow.weekday() == 6:
                     # silly way to have a bitfield that toggles every sunday
                     bit = self.bot.valkey.bitfield(
@@ -252,7 +469,6 @@ class Autorunners(utils.Extension):
                 else:
                     bit_resp: list[int] = [1]
 
-                await utils.sleep_until(tomorrow)
                 await self.reoccurring_lb_loop(
                     tomorrow.weekday() == 6, bit_resp[0] % 2 == 0, tomorrow.day <= 7
                 )
@@ -264,136 +480,210 @@ class Autorunners(utils.Extension):
     async def reoccurring_lb_loop(
         self, sunday: bool, second_sunday: bool, first_sunday_of_month: bool
     ) -> None:
-        lb_command = next(
-            c for c in self.bot.application_commands if str(c.name) == "leaderboard"
-        )
-
+        # the tens digit of reoccurring_leaderboard is how often it's sent -
+        # see utils.REOCCURRING_LB_FREQUENCY
         if not sunday:
-            configs = await models.GuildConfig.filter(
-                guild_id__in=[int(g) for g in self.bot.user._guild_ids],
-                reoccurring_leaderboard__isnull=False,
-                realm_id__isnull=False,
-                reoccurring_leaderboard__gte=40,
-                reoccurring_leaderboard__lt=50,
-            ).prefetch_related("premium_code")
+            frequencies = {4}
         elif second_sunday and first_sunday_of_month:
-            configs = await models.GuildConfig.filter(
-                guild_id__in=[int(g) for g in self.bot.user._guild_ids],
-                reoccurring_leaderboard__isnull=False,
-                realm_id__isnull=False,
-            ).prefetch_related("premium_code")
+            frequencies = {1, 2, 3, 4}
         elif first_sunday_of_month:
-            configs = await models.GuildConfig.filter(
-                Q(guild_id__in=[int(g) for g in self.bot.user._guild_ids])
-                & Q(reoccurring_leaderboard__isnull=False)
-                & Q(realm_id__isnull=False)
-                & ~(
-                    Q(reoccurring_leaderboard__gte=20)
-                    & Q(reoccurring_leaderboard__lt=30)
-                )
-            ).prefetch_related("premium_code")
+            frequencies = {1, 3, 4}
         elif second_sunday:
-            configs = await models.GuildConfig.filter(
-                Q(guild_id__in=[int(g) for g in self.bot.user._guild_ids])
-                & Q(reoccurring_leaderboard__isnull=False)
-                & Q(realm_id__isnull=False)
-                & ~(
-                    Q(reoccurring_leaderboard__gte=30)
-                    & Q(reoccurring_leaderboard__lt=40)
-                )
-            ).prefetch_related("premium_code")
+            frequencies = {1, 2, 4}
         else:
-            configs = await models.GuildConfig.filter(
-                Q(guild_id__in=[int(g) for g in self.bot.user._guild_ids])
-                & Q(reoccurring_leaderboard__isnull=False)
-                & Q(realm_id__isnull=False)
-                & ~(
-                    Q(reoccurring_leaderboard__gte=20)
-                    & Q(reoccurring_leaderboard__lt=40)
-                )
-            ).prefetch_related("premium_code")
+            frequencies = {1, 4}
+
+        configs: list[models.GuildConfig] = []
+        for config in self.present_configs(
+            lambda c: c.reoccurring_leaderboard is not None
+            and c.realm_id is not None
+            and c.reoccurring_leaderboard // 10 in frequencies
+        ):
+            if config.guild_id in self.bot.unavailable_guilds:
+                continue
+            if not config.valid_premium:
+                await pl_utils.invalidate_premium(self.bot, config)
+                continue
+            configs.append(config)
 
-        to_run = [self.send_reoccurring_lb(lb_command, config) for config in configs]
-        output = await asyncio.gather(*to_run, return_exceptions=True)
+        if not configs:
+            return
 
-        for message in output:
-            if isinstance(message, Exception):
-                await utils.error_handle(message)
+        now = ipy.Timestamp.utcnow().replace(second=30)
+        realm_periods: defaultdict[str, set[int]] = defaultdict(set)
+        for config in configs:
+            realm_periods[config.realm_id].add(
+                period_determiner(config.reoccurring_leaderboard % 10)
+            )
+        min_datetimes = {
+            period: now - datetime.timedelta(days=period, minutes=1)
+            for period in set().union(*realm_periods.values())
+        }
+
+        # one query for every realm going back as far as the longest period,
+        # then every leaderboard is worked out from that
+        datetimes = await stats_utils.gather_realm_datetimes(
+            realm_periods.keys(), min(min_datetimes.values())
+        )
 
-    async def send_reoccurring_lb(
-        self,
-        lb_command: ipy.InteractionCommand,
-        config: models.GuildConfig,
-    ) -> None:
-        if config.guild_id in self.bot.unavailable_guilds:
-            return
+        leaderboards: dict[tuple[str, int], list[tuple[str, int]]] = {}
+        for realm_id, periods in realm_periods.items():
+            for period, leaderboard in stats_utils.calc_leaderboards(
+                datetimes.get(realm_id, ()),
+                {period: min_datetimes[period] for period in periods},
+            ).items():
+                if leaderboard:
+                    leaderboards[(realm_id, period)] = leaderboard[:20]
 
-        if not config.valid_premium:
-            await pl_utils.invalidate_premium(self.bot, config)
+        if not leaderboards:
             return
 
-        # make a fake context to make things easier
-        a_ctx = utils.RealmPrefixedContext(client=self.bot)
-        a_ctx.author_id = self.bot.user.id
-        a_ctx.channel_id = ipy.to_snowflake(
-            config.get_notif_channel("reoccurring_leaderboard")
+        gamertag_map = await pl_utils.get_xuid_to_gamertag_map(
+            self.bot,
+            list({xuid for lb in leaderboards.values() for xuid, _ in lb}),
         )
-        a_ctx.guild_id = ipy.to_snowflake(config.guild_id)
-        a_ctx.config = config
 
-        a_ctx.prefix = ""
-        a_ctx.content_parameters = ""
-        a_ctx.command = None
-        a_ctx.args = []
-        a_ctx.kwargs = {}
+        # guilds on the same realm and period only differ by their nicknames
+        renders: dict[typing.Hashable, dict] = {}
+        templates: dict[int, embed_templates.EmbedTemplate] = {}
+        jobs: list[dispatch.DispatchJob] = []
 
-        try:
-            await asyncio.wait_for(
-                lb_command.callback(
-                    a_ctx,
-                    period_determiner(config.reoccurring_leaderboard % 10),
-                    autorunner=True,
+        for config in configs:
+            period_index = config.reoccurring_leaderboard % 10
+            period = period_determiner(period_index)
+            if not (leaderboard := leaderboards.get((config.realm_id, period))):
+                continue
+
+            if not (template := templates.get(period_index)):
+                template = templates[period_index] = (
+                    embed_templates.EmbedTemplate.create(
+                        color=self.bot.color,
+                        title=(
+                            "Leaderboard for the past"
+                            f" {utils.REOCCURRING_LB_PERIODS[period_index]}"
+                        ),
+                        timestamp=now,
+                    )
+                )
+
+            render_key = (
+                config.realm_id,
+                period,
+                pl_utils.nickname_fingerprint(
+                    config.nicknames, (xuid for xuid, _ in leaderboard)
                 ),
-                timeout=180,
             )
-        except ipy.errors.BadArgument:
-            return
+            if not (payload := renders.get(render_key)):
+                payload = renders[render_key] = embed_templates.message_payload(
+                    embeds=[
+                        template.render(
+                            description=stats_utils.format_leaderboard(
+                                leaderboard, gamertag_map, config.nicknames
+                            )
+                        )
+                    ]
+                )
+
+            jobs.append(
+                dispatch.DispatchJob(
+                    key=config.guild_id,
+                    channel_id=config.get_notif_channel("reoccurring_leaderboard"),
+                    func=functools.partial(self.send_reoccurring_lb, config, payload),
+                )
+            )
+
+        dispatcher = dispatch.StaggeredDispatcher(
+            self.bot, window=0, concurrency=AUTORUNNER_CONCURRENCY
+        )
+        stats = await dispatcher.run(jobs)
+
+        logger.info(
+            "Reoccurring leaderboards: %s/%s completed, %s timed out, %s failed, %s"
+            " retries, in %.2fs.",
+            stats.completed,
+            stats.total,
+            stats.timed_out,
+            stats.failed,
+            stats.retried,
+            stats.duration,
+        )
+
+    async def send_reoccurring_lb(
+        self, config: models.GuildConfig, payload: dict, job: dispatch.DispatchJob
+    ) -> None:
+        try:
+            await self.bot.send_scheduler.send_payload(
+                config.get_notif_channel("reoccurring_leaderboard"),
+                send_scheduler.SendPriority.LEADERBOARD,
+                payload,
+                on_start=job.mark_sending,
+            )
+            job.mark_sent()
         except ipy.errors.HTTPException as e:
-            if e.status < 500:
-                if config.notification_channels.get("reoccurring_leaderboard"):
-                    await pl_utils.eventually_invalidate_reoccurring_lb(
-                        self.bot, config
-                    )
-                else:
-                    await pl_utils.eventually_invalidate(self.bot, config)
+            if e.status >= 500 or e.status == 429:
+                raise
+
+            if config.notification_channels.get("reoccurring_leaderboard"):
+                self.bot.invalidations.add(
+                    invalidation.Invalidation.REOCCURRING_LB, config
+                )
+            else:
+                self.bot.invalidations.add(invalidation.Invalidation.PLAYERLIST, config)
 
     @ipy.Task.create(
         ipy.OrTrigger(ipy.TimeTrigger(utc=True), ipy.TimeTrigger(hour=12, utc=True))
     )
     async def player_session_delete(self) -> None:
+        if not await self.bot.leader.still_leader():
+            return
+
         now = datetime.datetime.now(tz=datetime.UTC)
         time_back = now - datetime.timedelta(days=31)
 
-        await models.PlayerSession.filter(
-            online=False,
-            last_seen__lt=time_back,
-        ).delete()
+        conn = connections.get("default")
 
-        too_far_ago = now - datetime.timedelta(hours=1)
-        online_for_too_long = await models.PlayerSession.filter(
-            online=True, last_seen__lt=too_far_ago
+        # deleting everything at once holds locks on a lot of rows for a long time,
+        # so delete in small batches with breaks in between
+        total_deleted = 0
+        batch_num = 0
+        while True:
+            start = time.perf_counter()
+            deleted, _ = await conn.execute_query(
+                PURGE_BATCH_QUERY, [time_back, PURGE_BATCH_SIZE]
+            )
+            batch_num += 1
+            total_deleted += deleted
+
+            logger.info(
+                "Purged %s old player sessions in batch %s in %.2fs.",
+                deleted,
+                batch_num,
+                time.perf_counter() - start,
+            )
+
+            if deleted < PURGE_BATCH_SIZE:
+                break
+            await asyncio.sleep(PURGE_BATCH_PAUSE)
+
+        logger.info(
+            "Purged %s old player sessions in %s batches.", total_deleted, batch_num
         )
 
-        await models.PlayerSession.filter(
-            online=True, last_seen__lt=too_far_ago
-        ).update(online=False)
+        too_far_ago = now - datetime.timedelta(hours=1)
+        # execute_query only gives back the count for updates, not the rows
+        stale_sessions = await conn.execute_query_dict(
+            STALE_ONLINE_QUERY, [too_far_ago]
+        )
 
-        for session in online_for_too_long:
-            self.bot.online_cache[int(session.realm_id)].discard(session.xuid)
+        for session in stale_sessions:
+            self.bot.online_cache[int(session["realm_id"])].discard(session["xuid"])
 
 
 def setup(bot: utils.RealmBotBase) -> None:
     importlib.reload(utils)
     importlib.reload(pl_utils)
     importlib.reload(cclasses)
+    importlib.reload(dispatch)
+    importlib.reload(embed_templates)
+    importlib.reload(stats_utils)
     Autorunners(bot)
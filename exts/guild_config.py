@@ -115,6 +115,8 @@ class GuildConfig(utils.Extension):
         # if it is online though, it'll quickly be removed from the set, so this works
         # out well enough
         self.bot.offline_realms.add(realm.id)
+        if utils.FEATURE("HANDLE_MISSING_REALMS"):
+            await pl_utils.mark_realms_missing(self.bot, (realm.id,))
 
         embeds: list[ipy.Embed] = []
 
@@ -217,9 +219,10 @@ class GuildConfig(utils.Extension):
 
             self.bot.offline_realms.discard(int(realm_id))
             self.bot.dropped_offline_realms.discard(int(realm_id))
-            await self.bot.valkey.delete(
-                f"missing-realm-{realm_id}", f"invalid-realmoffline-{realm_id}"
-            )
+            async with self.bot.valkey.pipeline() as pipe:
+                pipe.zrem(utils.MISSING_REALMS_KEY, realm_id)
+                pipe.delete(f"invalid-realmoffline-{realm_id}")
+                await pipe.execute()
 
     async def security_check(
         self, ctx: utils.RealmModalContext
@@ -153,6 +153,7 @@ class OwnerCMDs(utils.Extension):
         guild_id: str = tansy.Option("The guild ID for the guild to remove."),
     ) -> None:
         await GuildConfig.filter(guild_id=int(guild_id)).delete()
+        await self.bot.config_cache.invalidate(int(guild_id))
         await ctx.send("Deleted!")
 
     @prefixed.prefixed_command(aliases=["jsk"])
@@ -179,6 +180,15 @@ class OwnerCMDs(utils.Extension):
 
         e.add_field("Guilds", str(self.bot.guild_count))
 
+        if current_leader := await self.bot.leader.current():
+            leader_id, token = current_leader
+            leader_str = f"`{leader_id}` (token {token})"
+            if leader_id == self.bot.leader.instance_id:
+                leader_str += " - this process"
+        else:
+            leader_str = "None"
+        e.add_field("Leader", leader_str)
+
         await ctx.reply(embeds=[e])
 
     @debug.subcommand(aliases=["cache"])
@@ -429,9 +439,24 @@ class OwnerCMDs(utils.Extension):
         self, ctx: utils.RealmPrefixedContext
     ) -> None:
         async with ctx.channel.typing:
-            await self.bot.ext["Autorunners"].playerlist_loop(None)
+            await self.bot.ext["Autorunners"].playerlist_loop(None, window=0)
         await ctx.reply("Done!")
 
+    @debug.subcommand(aliases=["autorunner-stats", "autorunner-runs"])
+    async def autorunner_stats(self, ctx: utils.RealmPrefixedContext) -> None:
+        runs = self.bot.ext["Autorunners"].playerlist_runs
+        if not runs:
+            raise ipy.errors.BadArgument("The autorunner hasn't run yet.")
+
+        str_builder = [
+            f"<t:{int(stats.started_at.timestamp())}:f>:"
+            f" {stats.completed}/{stats.total} completed, {stats.timed_out} timed out,"
+            f" {stats.failed} failed, {stats.retried} retries, took"
+            f" {stats.duration:.2f}s (at most {stats.max_lateness:.2f}s late)"
+            for stats in reversed(runs)
+        ]
+        await ctx.reply("\n".join(str_builder[:10]))
+
     @debug.subcommand(
         aliases=["trigger-reoccurring-leaderboard", "trigger-reoccurring-lb"]
     )
@@ -448,6 +473,69 @@ class OwnerCMDs(utils.Extension):
             )
         await ctx.reply("Done!")
 
+    @debug.subcommand(aliases=["migrate-gamertags"])
+    async def migrate_gamertags(self, ctx: utils.RealmPrefixedContext) -> None:
+        if not self.bot.gamertag_store.use_hash:
+            raise ipy.errors.BadArgument(
+                "The hash gamertag store is not enabled, so there's nothing to migrate"
+                " to."
+            )
+
+        async with ctx.channel.typing:
+            migrated = await self.bot.gamertag_store.migrate_to_hash()
+        await ctx.reply(f"Migrated {migrated} entries.")
+
+    @debug.subcommand(aliases=["send-queue", "sends"])
+    async def send_queue(self, ctx: utils.RealmPrefixedContext) -> None:
+        str_builder = [
+            f"{priority.name.title()}: {stats['queued']} queued, {stats['sent']} sent,"
+            f" wait avg {stats['avg_wait']:.2f}s / p95 {stats['p95_wait']:.2f}s / max"
+            f" {stats['max_wait']:.2f}s"
+            for priority, stats in self.bot.send_scheduler.stats().items()
+        ]
+        await ctx.reply("\n".join(str_builder))
+
+    @debug.subcommand(aliases=["live-queue"])
+    async def live_queue(self, ctx: utils.RealmPrefixedContext) -> None:
+        stats = self.bot.live_playerlist_queue.stats()
+        if not stats:
+            raise ipy.errors.BadArgument("No live playerlists have been sent yet.")
+
+        # the slowest realms are the ones worth looking at
+        slowest = sorted(stats.items(), key=lambda i: i[1][1], reverse=True)[:15]
+        str_builder = [
+            f"{realm_id}: {queued} queued, p95 {p95:.2f}s"
+            for realm_id, (queued, p95) in slowest
+        ]
+        await ctx.reply("\n".join(str_builder))
+
+    @debug.subcommand(aliases=["config-cache", "check-config-cache"])
+    async def config_cache(
+        self, ctx: utils.RealmPrefixedContext, fix: bool = False
+    ) -> None:
+        async with ctx.channel.typing:
+            missing, extra, differing = await self.bot.config_cache.check_consistency()
+
+            if fix and (missing or extra or differing):
+                await self.bot.config_cache.invalidate(*missing, *extra, *differing)
+
+        if not (missing or extra or differing):
+            await ctx.reply(
+                f"Config cache is consistent ({len(self.bot.config_cache.by_guild)}"
+                " configs)."
+            )
+            return
+
+        str_builder = [
+            f"Missing from cache: {', '.join(str(g) for g in missing) or 'None'}",
+            f"Not in database: {', '.join(str(g) for g in extra) or 'None'}",
+            f"Differing: {', '.join(str(g) for g in differing) or 'None'}",
+        ]
+        if fix:
+            str_builder.append("Refreshed all of the above.")
+
+        await ctx.reply("\n".join(str_builder))
+
     @blacklist.subcommand(name="remove", aliases=["delete"])
     async def bl_remove(
         self, ctx: utils.RealmPrefixedContext, snowflake: ipy.SnowflakeObject
@@ -14,29 +14,71 @@ You should have received a copy of the GNU Affero General Public License along w
 Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
 """
 
+import asyncio
 import contextlib
+import functools
 import importlib
 import logging
 import os
+import time
 import typing
 
 import elytra
 import interactions as ipy
 from tortoise.transactions import in_transaction
 
+import common.embed_templates as embed_templates
+import common.invalidation as invalidation
 import common.models as models
 import common.playerlist_events as pl_events
 import common.playerlist_utils as pl_utils
+import common.send_scheduler as send_scheduler
 import common.utils as utils
+import common.webhooks as webhooks
 
 logger = logging.getLogger("realms_bot")
 
+SEND_CONCURRENCY = 10
+
+
+class LiveRender(typing.NamedTuple):
+    embed: dict
+    full_gamertag_mapping: dict[str, str]
+
 
 class PlayerlistEventHandling(utils.Extension):
     def __init__(self, bot: utils.RealmBotBase) -> None:
         self.bot: utils.RealmBotBase = bot
         self.name = "Playerlist Event Handling"
 
+        # live online message key -> (xuid -> gamertag), in display order
+        self.live_online_states: dict[str, dict[str, str]] = {}
+        self.pending_live_online_edits: dict[str, ipy.Embed] = {}
+        self.live_online_editing: set[str] = set()
+
+        self.bot.config_cache.change_listeners.append(self._on_config_change)
+
+    def drop(self) -> None:
+        with contextlib.suppress(ValueError):
+            self.bot.config_cache.change_listeners.remove(self._on_config_change)
+        super().drop()
+
+    def _on_config_change(
+        self, old: models.GuildConfig | None, new: models.GuildConfig | None
+    ) -> None:
+        # once a guild stops using its live online message, forget about it
+        if not old or not (key := old.live_online_channel):
+            return
+
+        if (
+            new is None
+            or new.live_online_channel != key
+            or new.realm_id != old.realm_id
+            or not new.live_playerlist
+        ):
+            self.live_online_states.pop(key, None)
+            self.pending_live_online_edits.pop(key, None)
+
     @ipy.listen("playerlist_parse_finish", is_default_listener=True)
     async def on_playerlist_finish(
         self, event: pl_events.PlayerlistParseFinish
@@ -49,10 +91,19 @@ class PlayerlistEventHandling(utils.Extension):
                     update_fields=container.fields,
                 )
 
+    @ipy.listen("online_cache_resync", is_default_listener=True)
+    async def on_online_cache_resync(self, _: pl_events.OnlineCacheResync) -> None:
+        # whoever was leader before us may have edited these messages since,
+        # so start over from what the messages are supposed to show now
+        self.live_online_states.clear()
+        self.pending_live_online_edits.clear()
+
     @ipy.listen("live_playerlist_send", is_default_listener=True)
     async def on_live_playerlist_send(
         self, event: pl_events.LivePlayerlistSend
     ) -> None:
+        start = time.perf_counter()
+
         player_sessions = [
             models.PlayerSession(
                 custom_id=self.bot.uuid_cache[f"{event.realm_id}-{p}"],
@@ -87,141 +138,192 @@ class PlayerlistEventHandling(utils.Extension):
             bypass_cache_for=bypass_cache_for,
         )
 
-        base_embed = ipy.Embed(
+        template = embed_templates.EmbedTemplate.create(
             color=ipy.RoleColors.DARK_GREY,
-            timestamp=ipy.Timestamp.fromdatetime(event.timestamp),
-        )
-        base_embed.set_footer(
-            f"{len(self.bot.online_cache[int(event.realm_id)])} players online"
+            footer=f"{len(self.bot.online_cache[int(event.realm_id)])} players online",
+            timestamp=event.timestamp,
         )
 
-        for guild_id in self.bot.live_playerlist_store[event.realm_id].copy():
-            config = await models.GuildConfig.get_or_none(
-                guild_id=guild_id
-            ).prefetch_related("premium_code")
+        guild_ids = self.bot.live_playerlist_store[event.realm_id].copy()
+        configs = {
+            guild_id: config
+            for guild_id in guild_ids
+            if (config := self.bot.config_cache.get(guild_id))
+        }
+
+        for guild_id in guild_ids.difference(configs.keys()):
+            self.bot.live_playerlist_store[event.realm_id].discard(guild_id)
+
+        # most guilds have no nicknames for any of these players, so they'd all
+        # end up rendering the exact same thing - only do it once per variation
+        renders: dict[tuple[tuple[str, str], ...], LiveRender] = {}
+
+        # realms take turns getting their guilds sent to, so that a realm linked
+        # to hundreds of guilds doesn't hold up every other realm
+        for config in configs.values():
+            self.bot.live_playerlist_queue.put(
+                event.realm_id,
+                functools.partial(
+                    self._send_live_playerlist,
+                    event,
+                    config,
+                    players,
+                    template,
+                    renders,
+                ),
+                enqueued_at=start,
+            )
 
-            if not config:
-                self.bot.live_playerlist_store[event.realm_id].discard(guild_id)
-                continue
+    async def _send_live_playerlist(
+        self,
+        event: pl_events.LivePlayerlistSend,
+        config: models.GuildConfig,
+        players: list[models.PlayerSession],
+        template: embed_templates.EmbedTemplate,
+        renders: dict[tuple[tuple[str, str], ...], "LiveRender"],
+    ) -> None:
+        guild_id = config.guild_id
 
-            if not config.valid_premium:
-                await pl_utils.invalidate_premium(self.bot, config)
-                continue
+        if not config.valid_premium:
+            await pl_utils.invalidate_premium(self.bot, config)
+            return
 
-            if not config.live_playerlist:
-                self.bot.live_playerlist_store[event.realm_id].discard(guild_id)
-                continue
+        if not config.live_playerlist:
+            self.bot.live_playerlist_store[event.realm_id].discard(guild_id)
+            return
 
-            if not config.playerlist_chan:
-                config.live_playerlist = False
-                self.bot.live_playerlist_store[event.realm_id].discard(guild_id)
-                await config.save()
-                continue
+        if not config.playerlist_chan:
+            config.live_playerlist = False
+            self.bot.live_playerlist_store[event.realm_id].discard(guild_id)
+            await config.save()
+            return
 
-            if guild_id in self.bot.unavailable_guilds:
-                continue
+        if guild_id in self.bot.unavailable_guilds:
+            return
 
-            gamertag_mapping = {
-                p.xuid: p.base_display(config.nicknames.get(p.xuid), markdown="**")
-                for p in players
-            }
-            full_gamertag_mapping = {
-                p.xuid: p.new_display(config.nicknames.get(p.xuid)) for p in players
-            }
-
-            if config.live_online_channel:
-                self.bot.dispatch(
-                    pl_events.LiveOnlineUpdate(
-                        event.realm_id,
-                        event.joined,
-                        event.left,
-                        event.timestamp,
-                        full_gamertag_mapping,
-                        config,
-                        realm_down_event=event.realm_down_event,
-                    )
-                )
+        fingerprint = pl_utils.nickname_fingerprint(
+            config.nicknames, (p.xuid for p in players)
+        )
+        if not (render := renders.get(fingerprint)):
+            render = renders[fingerprint] = self._render_live_playerlist(
+                event, players, template, config.nicknames
+            )
 
-            embed = ipy.Embed.from_dict(base_embed.to_dict())
+        if config.live_online_channel:
+            self.bot.dispatch(
+                pl_events.LiveOnlineUpdate(
+                    event.realm_id,
+                    event.joined,
+                    event.left,
+                    event.timestamp,
+                    render.full_gamertag_mapping,
+                    config,
+                    realm_down_event=event.realm_down_event,
+                )
+            )
 
-            if event.joined:
-                embed.add_field(
-                    name=f"{os.environ['GREEN_CIRCLE_EMOJI']} Joined",
-                    value="\n".join(
+        try:
+            await webhooks.send_payload(
+                self.bot,
+                config,
+                config.playerlist_chan,
+                send_scheduler.SendPriority.LIVE,
+                embed_templates.message_payload(embeds=[render.embed]),
+            )
+        except ValueError:
+            return
+        except ipy.errors.HTTPException as e:
+            if e.status < 500:
+                self.bot.invalidations.add(invalidation.Invalidation.PLAYERLIST, config)
+
+    def _render_live_playerlist(
+        self,
+        event: pl_events.LivePlayerlistSend,
+        players: list[models.PlayerSession],
+        template: embed_templates.EmbedTemplate,
+        nicknames: dict[str, str],
+    ) -> "LiveRender":
+        gamertag_mapping = {
+            p.xuid: p.base_display(nicknames.get(p.xuid), markdown="**")
+            for p in players
+        }
+        full_gamertag_mapping = {
+            p.xuid: p.new_display(nicknames.get(p.xuid)) for p in players
+        }
+
+        fields: list[dict] = []
+
+        if event.joined:
+            fields.append(
+                embed_templates.embed_field(
+                    f"{os.environ['GREEN_CIRCLE_EMOJI']} Joined",
+                    "\n".join(
                         sorted(
                             (gamertag_mapping[p] for p in event.joined),
                             key=lambda x: x.lower(),
                         )
                     ),
                 )
-            if event.left:
-                embed.add_field(
-                    name=f"{os.environ['GRAY_CIRCLE_EMOJI']} Left",
-                    value="\n".join(
+            )
+        if event.left:
+            fields.append(
+                embed_templates.embed_field(
+                    f"{os.environ['GRAY_CIRCLE_EMOJI']} Left",
+                    "\n".join(
                         sorted(
                             (gamertag_mapping[p] for p in event.left),
                             key=lambda x: x.lower(),
                         )
                     ),
                 )
+            )
 
-            try:
-                chan = utils.partial_channel(self.bot, config.playerlist_chan)
-                await chan.send(embeds=embed)
-            except ValueError:
-                continue
-            except ipy.errors.HTTPException as e:
-                if e.status < 500:
-                    await pl_utils.eventually_invalidate(self.bot, config)
-                    continue
+        return LiveRender(template.render(fields=fields), full_gamertag_mapping)
 
     @ipy.listen("live_online_update", is_default_listener=True)
     async def on_live_online_update(self, event: pl_events.LiveOnlineUpdate) -> None:
-        xuid_str: str | None = await self.bot.valkey.hget(
-            event.live_online_channel, "xuids"
-        )
-        gamertag_str: str | None = await self.bot.valkey.hget(
-            event.live_online_channel, "gamertags"
-        )
+        key = event.live_online_channel
 
-        if typing.TYPE_CHECKING:
-            # a lie, but a harmless one and one needed to make typehints properly work
-            assert isinstance(xuid_str, str)
-            assert isinstance(gamertag_str, str)
+        if key not in self.live_online_states:
+            xuid_str, gamertag_str = await self.bot.valkey.hmget(
+                key, "xuids", "gamertags"
+            )
 
-        xuids_init: list[str] = xuid_str.split(",") if xuid_str else []
-        gamertags: list[str] = gamertag_str.split("⏎") if gamertag_str else []
+            xuids_init: list[str] = xuid_str.split(",") if xuid_str else []
+            gamertags: list[str] = gamertag_str.split("⏎") if gamertag_str else []
 
-        event.gamertag_mapping.update(dict(zip(xuids_init, gamertags, strict=True)))
-        reverse_gamertag_map = {v: k for k, v in event.gamertag_mapping.items()}
+            # another update may have loaded this in while we were waiting
+            self.live_online_states.setdefault(
+                key, dict(zip(xuids_init, gamertags, strict=True))
+            )
 
-        xuids: set[str] = set(xuids_init)
-        xuids = xuids.union(event.joined).difference(event.left)
+        state = self.live_online_states[key]
 
-        gamertag_list = sorted(
-            (event.gamertag_mapping[xuid] for xuid in xuids), key=lambda g: g.lower()
-        )
-        xuid_list = [reverse_gamertag_map[g] for g in gamertag_list]
+        for xuid in event.left:
+            state.pop(xuid, None)
+        for xuid in event.joined:
+            state[xuid] = event.gamertag_mapping[xuid]
 
-        new_gamertag_str = "⏎".join(gamertag_list)
+        sorted_state = sorted(state.items(), key=lambda i: i[1].lower())
+        state = self.live_online_states[key] = dict(sorted_state)
+
+        new_gamertag_str = "⏎".join(state.values())
 
         await self.bot.valkey.hset(
-            event.live_online_channel, "xuids", ",".join(xuid_list)
-        )
-        await self.bot.valkey.hset(
-            event.live_online_channel, "gamertags", new_gamertag_str
+            key,
+            mapping={"xuids": ",".join(state.keys()), "gamertags": new_gamertag_str},
         )
 
         if event.realm_down_event:
             embed = ipy.Embed(
-                title=f"{len(xuids)}/10 Players Online",
+                title=f"{len(state)}/10 Players Online",
                 description=f"{os.environ['GRAY_CIRCLE_EMOJI']} *Realm is offline.*",
                 color=self.bot.color,
                 timestamp=event.timestamp,  # type: ignore
             )
         else:
             embed = ipy.Embed(
-                title=f"{len(xuids)}/10 Players Online",
+                title=f"{len(state)}/10 Players Online",
                 description=(
                     "\n".join(new_gamertag_str.split("⏎"))
                     if new_gamertag_str
@@ -232,17 +334,36 @@ class PlayerlistEventHandling(utils.Extension):
             )
         embed.set_footer("As of")
 
-        chan_id, msg_id = event.live_online_channel.split("|")
+        # if an edit is already going on, it'll pick this embed up once it's done -
+        # any embed that gets replaced before then is outdated anyways
+        self.pending_live_online_edits[key] = embed
+        if key not in self.live_online_editing:
+            self.live_online_editing.add(key)
+            try:
+                await self._edit_live_online(key, event.config)
+            finally:
+                self.live_online_editing.discard(key)
 
+    async def _edit_live_online(self, key: str, config: models.GuildConfig) -> None:
+        chan_id, msg_id = key.split("|")
         fake_msg = ipy.Message(client=self.bot, id=int(msg_id), channel_id=int(chan_id))  # type: ignore
 
-        try:
-            await fake_msg.edit(
-                embed=embed, allowed_mentions=ipy.AllowedMentions.none()
-            )
-        except ipy.errors.HTTPException as e:
-            if e.status < 500:
-                await pl_utils.eventually_invalidate_live_online(self.bot, event.config)
+        while embed := self.pending_live_online_edits.pop(key, None):
+            try:
+                await self.bot.send_scheduler.edit(
+                    fake_msg,
+                    send_scheduler.SendPriority.LIVE,
+                    embed=embed,
+                    allowed_mentions=ipy.AllowedMentions.none(),
+                )
+            except ipy.errors.HTTPException as e:
+                if e.status < 500:
+                    self.pending_live_online_edits.pop(key, None)
+                    self.live_online_states.pop(key, None)
+                    self.bot.invalidations.add(
+                        invalidation.Invalidation.LIVE_ONLINE, config
+                    )
+                    return
 
     @ipy.listen("realm_down", is_default_listener=True)
     async def realm_down(self, event: pl_events.RealmDown) -> None:
@@ -259,42 +380,50 @@ class PlayerlistEventHandling(utils.Extension):
             )
 
         # these, meanwhile, aren't
-        for config in await event.configs():
-            if not config.playerlist_chan or not config.realm_offline_role:
-                continue
-
-            if config.guild_id in self.bot.unavailable_guilds:
-                continue
-
-            role_mention = f"<@&{config.realm_offline_role}>"
-
-            embed = ipy.Embed(
-                title="Realm Offline",
-                description=(
-                    "The bot has detected that the Realm has gone offline (or that all"
-                    " users have left the Realm)."
-                ),
-                timestamp=ipy.Timestamp.fromdatetime(event.timestamp),
-                color=ipy.RoleColors.YELLOW,
-            )
+        configs = [
+            config
+            for config in await event.configs()
+            if config.playerlist_chan
+            and config.realm_offline_role
+            and config.guild_id not in self.bot.unavailable_guilds
+        ]
+        if not configs:
+            return
+
+        # the embed is the same for everyone, so only build it once
+        embed = ipy.Embed(
+            title="Realm Offline",
+            description=(
+                "The bot has detected that the Realm has gone offline (or that all"
+                " users have left the Realm)."
+            ),
+            timestamp=ipy.Timestamp.fromdatetime(event.timestamp),
+            color=ipy.RoleColors.YELLOW,
+        ).to_dict()
+
+        sem = asyncio.Semaphore(SEND_CONCURRENCY)
+
+        async def _send(config: models.GuildConfig) -> None:
+            async with sem:
+                try:
+                    await self.bot.send_scheduler.send(
+                        config.get_notif_channel("realm_offline"),
+                        send_scheduler.SendPriority.OFFLINE,
+                        f"<@&{config.realm_offline_role}>",
+                        embeds=embed,
+                        allowed_mentions=ipy.AllowedMentions.all(),
+                    )
+                except (ipy.errors.HTTPException, ValueError):
+                    if config.notification_channels.get("realm_offline"):
+                        self.bot.invalidations.add(
+                            invalidation.Invalidation.REALM_OFFLINE, config
+                        )
+                    else:
+                        self.bot.invalidations.add(
+                            invalidation.Invalidation.PLAYERLIST, config
+                        )
 
-            try:
-                chan = utils.partial_channel(
-                    self.bot,
-                    config.get_notif_channel("realm_offline"),
-                )
-
-                await chan.send(
-                    role_mention,
-                    embeds=embed,
-                    allowed_mentions=ipy.AllowedMentions.all(),
-                )
-            except (ipy.errors.HTTPException, ValueError):
-                if config.notification_channels.get("realm_offline"):
-                    await pl_utils.eventually_invalidate_realm_offline(self.bot, config)
-                else:
-                    await pl_utils.eventually_invalidate(self.bot, config)
-                continue
+        await asyncio.gather(*(_send(config) for config in configs))
 
     @ipy.listen("warn_missing_playerlist", is_default_listener=True)
     async def warning_missing_playerlist(
@@ -332,13 +461,13 @@ class PlayerlistEventHandling(utils.Extension):
 
             logger.info("Warning %s for missing Realm.", config.guild_id)
 
-            await pl_utils.eventually_invalidate(self.bot, config, limit=7)
+            self.bot.invalidations.add(
+                invalidation.Invalidation.PLAYERLIST_MISSING, config
+            )
 
             if not config.playerlist_chan:
                 continue
 
-            chan = utils.partial_channel(self.bot, config.playerlist_chan)
-
             with contextlib.suppress(ipy.errors.HTTPException):
                 content = (
                     "I have been unable to get any information about your Realm for"
@@ -358,12 +487,17 @@ class PlayerlistEventHandling(utils.Extension):
                     " playerlist and related settings after 7 days of not getting"
                     " information from your Realm."
                 )
-                await chan.send(content=content)
+                await self.bot.send_scheduler.send(
+                    config.playerlist_chan,
+                    send_scheduler.SendPriority.OFFLINE,
+                    content=content,
+                )
 
         if all(no_playerlist_chan) or not no_playerlist_chan:
             self.bot.live_playerlist_store.pop(event.realm_id, None)
             self.bot.fetch_devices_for.discard(event.realm_id)
             self.bot.offline_realms.discard(int(event.realm_id))
+            await self.bot.valkey.zrem(utils.MISSING_REALMS_KEY, event.realm_id)
 
             # we don't want to stop the whole thing, but as of right now i would
             # like to know what happens with invalid stuff
@@ -378,53 +512,81 @@ class PlayerlistEventHandling(utils.Extension):
 
     @ipy.listen(pl_events.PlayerWatchlistMatch, is_default_listener=True)
     async def watchlist_notify(self, event: pl_events.PlayerWatchlistMatch) -> None:
-        for config in await event.configs():
+        configs = await event.configs()
+        if not configs:
+            return
+
+        # nicknames would be shown over the gamertag anyways, so no need to get
+        # gamertags for anyone who has a nickname in every guild
+        gamertag_map = await pl_utils.get_xuid_to_gamertag_map(
+            self.bot,
+            [
+                xuid
+                for xuid in event.matches
+                if any(xuid not in config.nicknames for config in configs)
+            ],
+        )
+
+        for config in configs:
+            xuids = sorted(
+                xuid
+                for xuid, guild_ids in event.matches.items()
+                if config.guild_id in guild_ids
+            )
+
             if not config.playerlist_chan or not config.player_watchlist:
-                self.bot.player_watchlist_store[
-                    f"{event.realm_id}-{event.player_xuid}"
-                ].discard(config.guild_id)
+                for xuid in xuids:
+                    self.bot.player_watchlist_store[f"{event.realm_id}-{xuid}"].discard(
+                        config.guild_id
+                    )
                 config.player_watchlist = None
                 await config.save()
                 continue
 
-            try:
-                chan = utils.partial_channel(
-                    self.bot,
-                    config.get_notif_channel("player_watchlist"),
-                )
-
-                gamertag = None
-
-                if event.player_xuid not in config.nicknames:
-                    with contextlib.suppress(ipy.errors.BadArgument):
-                        gamertag = await pl_utils.gamertag_from_xuid(
-                            self.bot, event.player_xuid
-                        )
+            displays = sorted(
+                (
+                    models.display_gamertag(
+                        xuid, gamertag_map[xuid], config.nicknames.get(xuid)
+                    )
+                    for xuid in xuids
+                ),
+                key=lambda d: d.lower(),
+            )
 
-                display = models.display_gamertag(
-                    event.player_xuid, gamertag, config.nicknames.get(event.player_xuid)
-                )
+            if len(displays) > 2:
+                joined_str = f"{', '.join(displays[:-1])}, and {displays[-1]}"
+            else:
+                joined_str = " and ".join(displays)
 
-                content = ""
-                if config.player_watchlist_role:
-                    content = f"<@&{config.player_watchlist_role}>, "
+            content = ""
+            if config.player_watchlist_role:
+                content = f"<@&{config.player_watchlist_role}>, "
 
-                content += f"{display} joined the Realm!"
+            content += f"{joined_str} joined the Realm!"
 
-                await chan.send(
+            try:
+                await self.bot.send_scheduler.send(
+                    config.get_notif_channel("player_watchlist"),
+                    send_scheduler.SendPriority.WATCHLIST,
                     content,
                     allowed_mentions=ipy.AllowedMentions.all(),
                 )
             except (ipy.errors.HTTPException, ValueError):
                 if config.notification_channels.get("player_watchlist"):
-                    await pl_utils.eventually_invalidate_watchlist(self.bot, config)
+                    self.bot.invalidations.add(
+                        invalidation.Invalidation.WATCHLIST, config
+                    )
                 else:
-                    await pl_utils.eventually_invalidate(self.bot, config)
+                    self.bot.invalidations.add(
+                        invalidation.Invalidation.PLAYERLIST, config
+                    )
                 continue
 
 
 def setup(bot: utils.RealmBotBase) -> None:
     importlib.reload(utils)
+    importlib.reload(embed_templates)
     importlib.reload(pl_events)
     importlib.reload(pl_utils)
+    importlib.reload(webhooks)
     PlayerlistEventHandling(bot)
@@ -15,6 +15,7 @@ Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
 """
 
 import asyncio
+import copy
 import datetime
 import importlib
 import math
@@ -28,10 +29,13 @@ import tansy
 from pypika import Order, PostgreSQLQuery, Table
 
 import common.classes as cclasses
+import common.embed_templates as embed_templates
 import common.models as models
 import common.playerlist_events as pl_events
 import common.playerlist_utils as pl_utils
+import common.send_scheduler as send_scheduler
 import common.utils as utils
+import common.webhooks as webhooks
 from common import help_tools
 
 
@@ -39,6 +43,9 @@ class PlayerlistKwargs(typing.TypedDict, total=False):
     autorunner: bool
     upsell: str | None
     gamertag_map: defaultdict[str, str]
+    render_cache: dict[typing.Hashable, list[dict]]
+    player_sessions: list[models.PlayerSession]
+    log_time: datetime.datetime
 
 
 class Playerlist(utils.Extension):
@@ -48,6 +55,7 @@ class Playerlist(utils.Extension):
 
         self.previous_now = datetime.datetime.now(tz=datetime.UTC)
         self.forbidden_count: int = 0
+        self.synced_token: int | None = None
 
         if utils.FEATURE("PROCESS_REALMS"):
             self.get_people_task = self.bot.create_task(self.get_people_runner())
@@ -70,7 +78,20 @@ class Playerlist(utils.Extension):
 
         while True:
             next_time = self.next_time()
+
+            if not self.bot.leader.is_leader:
+                # another process is polling - what we know about who's online
+                # will be out of date if we ever take over
+                self.synced_token = None
+                await utils.sleep_until(next_time)
+                continue
+
             try:
+                if self.synced_token != self.bot.leader.token:
+                    await self.sync_online_cache()
+                    self.synced_token = self.bot.leader.token
+                    self.bot.dispatch(pl_events.OnlineCacheResync(self.synced_token))
+
                 start = time.perf_counter()
                 await self.parse_realms()
                 end = time.perf_counter()
@@ -89,6 +110,20 @@ class Playerlist(utils.Extension):
                     break
             await utils.sleep_until(next_time)
 
+    async def sync_online_cache(self) -> None:
+        """Reloads who's online from the database, as of whoever polled last."""
+        self.bot.online_cache.clear()
+        self.bot.uuid_cache.clear()
+
+        async for player in models.PlayerSession.filter(online=True):
+            self.bot.uuid_cache[player.realm_xuid_id] = player.custom_id
+            self.bot.online_cache[int(player.realm_id)].add(player.xuid)
+
+        # these could've changed a lot while another process was leader too
+        await pl_utils.load_realm_stores(self.bot)
+
+        self.previous_now = datetime.datetime.now(tz=datetime.UTC)
+
     async def parse_realms(self) -> None:
         try:
             realms = await self.bot.realms.fetch_activities()
@@ -116,6 +151,7 @@ class Playerlist(utils.Extension):
 
         player_objs: list[models.PlayerSession] = []
         joined_player_objs: list[models.PlayerSession] = []
+        device_prefetch_objs: list[models.PlayerSession] = []
         gotten_realm_ids: set[int] = set()
         now = datetime.datetime.now(tz=datetime.UTC)
 
@@ -123,6 +159,7 @@ class Playerlist(utils.Extension):
             gotten_realm_ids.add(realm.id)
             player_set: set[str] = set()
             joined: set[str] = set()
+            watchlist_matches: dict[str, set[int]] = {}
 
             for player in realm.players:
                 player_set.add(player.uuid)
@@ -140,19 +177,27 @@ class Playerlist(utils.Extension):
                     kwargs["joined_at"] = now
                     joined_player_objs.append(models.PlayerSession(**kwargs))
 
+                    # realms with a live playerlist get their devices fetched
+                    # (and cached) when the live playerlist is sent out anyways
+                    if (
+                        str(realm.id) in self.bot.fetch_devices_for
+                        and not self.bot.live_playerlist_store[str(realm.id)]
+                    ):
+                        device_prefetch_objs.append(models.PlayerSession(**kwargs))
+
                     if guild_ids := self.bot.player_watchlist_store[
                         f"{realm.id}-{player.uuid}"
                     ]:
-                        self.bot.dispatch(
-                            pl_events.PlayerWatchlistMatch(
-                                str(realm.id),
-                                player.uuid,
-                                guild_ids,
-                            )
-                        )
+                        watchlist_matches[player.uuid] = guild_ids.copy()
                 else:
                     player_objs.append(models.PlayerSession(**kwargs))
 
+            # friends often join together, so notify about all of them at once
+            if watchlist_matches:
+                self.bot.dispatch(
+                    pl_events.PlayerWatchlistMatch(str(realm.id), watchlist_matches)
+                )
+
             left = self.bot.online_cache[realm.id].difference(player_set)
 
             # if all of the players left, there MAY be a crash, but it's hard
@@ -199,10 +244,13 @@ class Playerlist(utils.Extension):
                     )
                 )
 
+        newly_missing: list[int] = []
+
         online_cache_ids = set(self.bot.online_cache.keys())
         for missed_realm_id in online_cache_ids.difference(gotten_realm_ids):
             # adds the missing realm id to the countdown timer dict
-
+            if missed_realm_id not in self.bot.offline_realms:
+                newly_missing.append(missed_realm_id)
             self.bot.offline_realms.add(missed_realm_id)
 
             now_invalid = self.bot.online_cache.pop(missed_realm_id, None)
@@ -229,6 +277,14 @@ class Playerlist(utils.Extension):
 
         self.previous_now = now
 
+        if newly_missing and utils.FEATURE("HANDLE_MISSING_REALMS"):
+            await pl_utils.mark_realms_missing(self.bot, newly_missing, now)
+
+        if device_prefetch_objs:
+            self.bot.create_task(
+                pl_utils.prefetch_devices(self.bot, device_prefetch_objs)
+            )
+
         self.bot.dispatch(
             pl_events.PlayerlistParseFinish(
                 (
@@ -241,29 +297,35 @@ class Playerlist(utils.Extension):
         )
 
     async def handle_missing_warning(self) -> None:
-        # basically, for every realm that has been determined to be offline/missing -
-        # increase its value by one. if it increases more than a set value,
-        # try to warn the user about the realm not being there
+        # every realm that's missing is stored with when it first went missing
+        # (or was last warned about), so the only writes here are for realms that
+        # came back or are being warned about. if a realm has been missing for long
+        # enough, try to warn the user about the realm not being there
         # ideally, this should run every minute
-
-        offline_realms = self.bot.offline_realms.copy()
+        cutoff = time.time() - utils.WARN_MISSING_REALMS_AFTER
+        dropped, self.bot.dropped_offline_realms = (
+            self.bot.dropped_offline_realms,
+            set(),
+        )
 
         async with self.bot.valkey.pipeline() as pipe:
-            for realm_id in offline_realms:
-                pipe.incr(f"missing-realm-{realm_id}", 1)
-
-            results: list[int] = await pipe.execute()
-
-        for realm_id, value in zip(offline_realms, results, strict=True):
-            if value >= 1440:
-                self.bot.dispatch(pl_events.WarnMissingPlayerlist(str(realm_id)))
-                self.bot.dropped_offline_realms.add(realm_id)
-
-        if self.bot.dropped_offline_realms:
-            await self.bot.valkey.delete(
-                *(f"missing-realm-{rid}" for rid in self.bot.dropped_offline_realms)
-            )
-            self.bot.dropped_offline_realms = set()
+            if dropped:
+                pipe.zrem(utils.MISSING_REALMS_KEY, *dropped)
+            pipe.zrangebyscore(utils.MISSING_REALMS_KEY, "-inf", cutoff)
+            results: list = await pipe.execute()
+
+        if not (to_warn := [int(realm_id) for realm_id in results[-1]]):
+            return
+
+        for realm_id in to_warn:
+            self.bot.dispatch(pl_events.WarnMissingPlayerlist(str(realm_id)))
+
+        # start the countdown over, so it gets warned about again in another day
+        # if it's still missing - those repeats are what eventually unlink it
+        now = time.time()
+        await self.bot.valkey.zadd(
+            utils.MISSING_REALMS_KEY, {str(realm_id): now for realm_id in to_warn}
+        )
 
     @tansy.slash_command(
         name="playerlist",
@@ -312,9 +374,6 @@ class Playerlist(utils.Extension):
 
         config = await ctx.fetch_config()
 
-        if gamertag_map:
-            gamertag_map |= config.nicknames
-
         # this may seem a bit weird to you... but let's say it's 8:00:03, and we want to
         # go one hour back
         # a naive implementation would just subtract one hour from the time, getting 7:00:03,
@@ -331,24 +390,29 @@ class Playerlist(utils.Extension):
 
         hour_text = "hour" if hours_ago == 1 else "hours"
 
-        playersession = Table(models.PlayerSession.Meta.table)
-        query = (
-            PostgreSQLQuery.from_(playersession)
-            .select(*models.PlayerSession._meta.fields)
-            .where(
-                playersession.realm_id.eq(str(config.realm_id))
-                & (
-                    playersession.online.eq(True)
-                    | playersession.last_seen.gte(time_ago)
+        # the autorunner fetches the sessions for every realm at once
+        shared_sessions = kwargs.get("player_sessions") if autorunner else None
+        if shared_sessions is not None:
+            player_sessions = shared_sessions
+        else:
+            playersession = Table(models.PlayerSession.Meta.table)
+            query = (
+                PostgreSQLQuery.from_(playersession)
+                .select(*models.PlayerSession._meta.fields)
+                .where(
+                    playersession.realm_id.eq(str(config.realm_id))
+                    & (
+                        playersession.online.eq(True)
+                        | playersession.last_seen.gte(time_ago)
+                    )
                 )
+                .orderby("xuid", order=Order.asc)
+                .orderby("last_seen", order=Order.desc)
+                .distinct_on("xuid")  # type: ignore
             )
-            .orderby("xuid", order=Order.asc)
-            .orderby("last_seen", order=Order.desc)
-            .distinct_on("xuid")  # type: ignore
-        )
-        player_sessions: list[models.PlayerSession] = await models.PlayerSession.raw(
-            str(query)
-        )  # type: ignore
+            player_sessions: list[models.PlayerSession] = (
+                await models.PlayerSession.raw(str(query))
+            )  # type: ignore
 
         if not player_sessions:
             if autorunner:
@@ -366,6 +430,34 @@ class Playerlist(utils.Extension):
             else:
                 await pl_utils.invalidate_premium(self.bot, config)
 
+        # guilds on the same realm usually render the exact same log, so the
+        # autorunner lets us share renders between them
+        render_cache = kwargs.get("render_cache") if autorunner else None
+        # the autorunner sends these out over a few minutes, so have every guild
+        # show the same time rather than whenever the last poll was
+        as_of = (kwargs.get("log_time") if autorunner else None) or self.previous_now
+        render_key = (
+            config.realm_id,
+            hours_ago,
+            as_of,
+            pl_utils.nickname_fingerprint(
+                config.nicknames, (p.xuid for p in player_sessions)
+            ),
+            bool(bypass_cache_for),
+            upsell if not config.valid_premium else None,
+        )
+        if render_cache is not None and (cached := render_cache.get(render_key)):
+            await self._send_autorunner_log(ctx, config, cached, as_of)
+            return
+
+        if shared_sessions is not None:
+            # filling these in is different per guild (nicknames, devices),
+            # so work on copies
+            player_sessions = [copy.copy(p) for p in shared_sessions]
+        if gamertag_map:
+            # copy, as the autorunner shares this map between guilds
+            gamertag_map = gamertag_map | config.nicknames
+
         player_list = await pl_utils.fill_in_gamertags_for_sessions(
             self.bot,
             player_sessions,
@@ -409,22 +501,27 @@ class Playerlist(utils.Extension):
             ]
 
         if mode == "compact":
-            embeds: list[ipy.Embed] = []
-            timestamp = ipy.Timestamp.fromdatetime(self.previous_now)
+            embeds: list[dict] = []
+            timestamp = ipy.Timestamp.fromdatetime(as_of)
+            online_template = embed_templates.EmbedTemplate.create(
+                color=ipy.Color.from_hex("7abd59"),
+                title="Players currently online",
+                footer="As of",
+                timestamp=timestamp,
+            )
+            offline_template = embed_templates.EmbedTemplate.create(
+                color=ipy.Color.from_hex("95a5a6"),
+                footer="As of",
+                timestamp=timestamp,
+            )
 
             if online_list:
                 embeds.append(
-                    ipy.Embed(
-                        color=ipy.Color.from_hex("7abd59"),
-                        title="Players currently online",
-                        description="\n".join(online_list),
-                        footer=ipy.EmbedFooter(text="As of"),
-                        timestamp=timestamp,
-                    )
+                    online_template.render(description="\n".join(online_list))
                 )
 
             if offline_list:
-                offline_embeds: list[ipy.Embed] = []
+                offline_embeds: list[dict] = []
 
                 current_entries: list[str] = []
                 current_length: int = 0
@@ -433,11 +530,8 @@ class Playerlist(utils.Extension):
                     current_length += len(entry)
                     if current_length > 3900:
                         offline_embeds.append(
-                            ipy.Embed(
-                                color=ipy.Color.from_hex("95a5a6"),
-                                description="\n".join(current_entries),
-                                footer=ipy.EmbedFooter(text="As of"),
-                                timestamp=timestamp,
+                            offline_template.render(
+                                description="\n".join(current_entries)
                             )
                         )
                         current_entries = []
@@ -447,47 +541,30 @@ class Playerlist(utils.Extension):
 
                 if current_entries:
                     offline_embeds.append(
-                        ipy.Embed(
-                            color=ipy.Color.from_hex("95a5a6"),
-                            description="\n".join(current_entries),
-                            footer=ipy.EmbedFooter(text="As of"),
-                            timestamp=timestamp,
-                        )
+                        offline_template.render(description="\n".join(current_entries))
                     )
 
-                offline_embeds[0].title = (
-                    f"Players on in the last {hours_ago} {hour_text}"
-                )
+                offline_embeds[0][
+                    "title"
+                ] = f"Players on in the last {hours_ago} {hour_text}"
                 embeds.extend(offline_embeds)
 
             if upsell and not config.valid_premium:
                 # add upsell message to last embed
-                embeds[-1].set_footer(upsell)
+                embeds[-1]["footer"] = {"text": upsell}
 
             if autorunner:
-                first_embed = True
-
-                for embed in embeds:
-                    # each embed can border very close to the max character in a message limit,
-                    # so we have to send each one individually
-
-                    if first_embed:
-                        # if we're using the autorunner, add a little message to note that
-                        # this is a log
-                        await ctx.send(
-                            content=f"Autorunner log for {timestamp.format('f')}:",
-                            embed=embed,
-                        )
-                        first_embed = False
-                    else:
-                        await ctx.send(embeds=embed)
+                if render_cache is not None:
+                    render_cache[render_key] = embeds
+
+                await self._send_autorunner_log(ctx, config, embeds, as_of)
             else:
                 if len(embeds) == 1:
                     await ctx.send(embeds=embeds[0])
                     return
 
                 pag = help_tools.HelpPaginator.create_from_embeds(
-                    self.bot, *embeds, timeout=120
+                    self.bot, *(ipy.Embed.from_dict(e) for e in embeds), timeout=120
                 )
                 await pag.send(ctx)
         else:
@@ -550,6 +627,44 @@ class Playerlist(utils.Extension):
             )
             await pag.send(ctx)
 
+    async def _send_autorunner_log(
+        self,
+        ctx: utils.RealmContext | utils.RealmPrefixedContext,
+        config: models.GuildConfig,
+        embeds: list[dict],
+        as_of: datetime.datetime,
+    ) -> None:
+        timestamp = ipy.Timestamp.fromdatetime(as_of)
+        priority = (
+            getattr(ctx, "send_priority", None)
+            or send_scheduler.SendPriority.AUTORUNNER
+        )
+
+        job = getattr(ctx, "dispatch_job", None)
+
+        # each embed can border very close to the max character in a message limit,
+        # so only put as many together as discord allows
+        for index, message_embeds in enumerate(embed_templates.pack_embeds(embeds)):
+            if job and index < job.sent:
+                # went out on an earlier try
+                continue
+
+            # add a little message to the first one to note that this is a log
+            payload = embed_templates.message_payload(
+                f"Autorunner log for {timestamp.format('f')}:" if index == 0 else None,
+                embeds=message_embeds,
+            )
+            await webhooks.send_payload(
+                self.bot,
+                config,
+                ctx.channel_id,
+                priority,
+                payload,
+                on_start=job.mark_sending if job else None,
+            )
+            if job:
+                job.mark_sent()
+
     @tansy.slash_command(
         "online",
         description="Allows you to see if anyone is online on the Realm right now.",
@@ -643,6 +758,8 @@ class Playerlist(utils.Extension):
 def setup(bot: utils.RealmBotBase) -> None:
     importlib.reload(utils)
     importlib.reload(cclasses)
+    importlib.reload(embed_templates)
     importlib.reload(pl_events)
     importlib.reload(pl_utils)
+    importlib.reload(webhooks)
     Playerlist(bot)
@@ -27,6 +27,7 @@ import common.models as models
 import common.playerlist_utils as pl_utils
 import common.premium_utils as premium_utils
 import common.utils as utils
+import common.webhooks as webhooks
 
 
 def premium_check[
@@ -279,8 +280,10 @@ class PremiumHandling(utils.Extension):
         config.live_online_channel = f"{msg._channel_id}|{msg.id}"
         await config.save()
 
-        await self.bot.valkey.hset(config.live_online_channel, "xuids", xuids)
-        await self.bot.valkey.hset(config.live_online_channel, "gamertags", online_str)
+        await self.bot.valkey.hset(
+            config.live_online_channel,
+            mapping={"xuids": xuids, "gamertags": online_str},
+        )
 
         await ctx.send(embeds=utils.make_embed("Done!"), ephemeral=True)
 
@@ -375,6 +378,51 @@ class PremiumHandling(utils.Extension):
             ):
                 self.bot.fetch_devices_for.discard(config.realm_id)
 
+    @premium.subcommand(
+        sub_cmd_name="webhook-delivery",
+        sub_cmd_description=(
+            "Sends the live playerlist and autorunner through a webhook. Premium only;"
+            " useful for very active Realms."
+        ),
+    )
+    @ipy.auto_defer()
+    @premium_check()
+    async def toggle_webhook_delivery(
+        self,
+        ctx: utils.RealmContext,
+        toggle: bool = tansy.Option("Should it be on (true) or off (false)?"),
+    ) -> None:
+        config = await ctx.fetch_config()
+
+        if not config.playerlist_chan:
+            raise utils.CustomCheckFailure(
+                "You need to set a playerlist channel before running this."
+            )
+        if config.webhook_delivery == toggle:
+            raise ipy.errors.BadArgument("That's already the current setting.")
+
+        if toggle:
+            # make the webhook now so any issues with it show up here instead of
+            # silently later on
+            try:
+                await webhooks.fetch_webhook(self.bot, config.playerlist_chan)
+            except ipy.errors.HTTPException:
+                raise utils.CustomCheckFailure(
+                    "An error occured when trying to make a webhook for the playerlist"
+                    " channel. Make sure the bot has `Manage Webhooks` enabled for"
+                    " that channel, and that the channel has less than 15 webhooks."
+                ) from None
+        else:
+            await webhooks.forget_webhook(self.bot, config.playerlist_chan, delete=True)
+
+        config.webhook_delivery = toggle
+        await config.save()
+        await ctx.send(
+            embeds=utils.make_embed(
+                f"Turned {utils.toggle_friendly_str(toggle)} webhook delivery."
+            )
+        )
+
     @premium.subcommand(
         sub_cmd_name="export",
         sub_cmd_description=(
@@ -571,6 +619,7 @@ class PremiumHandling(utils.Extension):
         await models.GuildConfig.filter(
             guild_id=int(entitlement._guild_id),
         ).update(premium_code_id=code.id)
+        await self.bot.config_cache.invalidate(int(entitlement._guild_id))
 
         code.uses += 1
         await code.save()
@@ -595,6 +644,10 @@ class PremiumHandling(utils.Extension):
         await models.PremiumCode.filter(
             customer_id=id_to_use,
         ).update(expires_at=entitlement.ends_at)
+        await self.bot.config_cache.invalidate_where(
+            lambda c: c.premium_code_id is not None
+            and c.premium_code.customer_id == id_to_use
+        )
 
     @ipy.listen(ipy.events.EntitlementDelete)
     async def entitlement_delete(self, event: ipy.events.EntitlementDelete) -> None:
@@ -612,6 +665,10 @@ class PremiumHandling(utils.Extension):
             else str(entitlement.id)
         )
         await models.PremiumCode.filter(customer_id=id_to_use).delete()
+        await self.bot.config_cache.invalidate_where(
+            lambda c: c.premium_code_id is not None
+            and c.premium_code.customer_id == id_to_use
+        )
 
 
 def setup(bot: utils.RealmBotBase) -> None:
@@ -619,4 +676,5 @@ def setup(bot: utils.RealmBotBase) -> None:
     importlib.reload(cclasses)
     importlib.reload(pl_utils)
     importlib.reload(premium_utils)
+    importlib.reload(webhooks)
     PremiumHandling(bot)
@@ -33,10 +33,6 @@ import common.stats_utils as stats_utils
 import common.utils as utils
 
 
-class LeaderboardKwargs(typing.TypedDict, total=False):
-    autorunner: bool
-
-
 class PlaytimeReturn(typing.NamedTuple):
     total_playtime: float
     period_str: str
@@ -501,7 +497,6 @@ class Statistics(utils.Extension):
                 ipy.SlashCommandChoice("30 days", 30),
             ],
         ),
-        **kwargs: typing.Unpack[LeaderboardKwargs],
     ) -> None:
         config = await ctx.fetch_config()
 
@@ -541,12 +536,9 @@ class Statistics(utils.Extension):
                 "There's no data for the linked Realm for this timespan."
             )
 
-        if kwargs.get("autorunner"):
-            leaderboard_counter_sort = leaderboard_counter_sort[:20]
-
         period_str = period_resolver(period)
 
-        if warn_about_earliest and not kwargs.get("autorunner"):
+        if warn_about_earliest:
             embed = ipy.Embed(
                 title="Warning",
                 description=(
@@ -575,25 +567,11 @@ class Statistics(utils.Extension):
             [e[0] for e in leaderboard_counter_sort if e[0] not in config.nicknames],
         )
 
-        leaderboard_builder: list[str] = []
-
-        for index, (xuid, playtime) in enumerate(leaderboard_counter_sort):
-            precisedelta = humanize.precisedelta(
-                playtime, minimum_unit="minutes", format="%0.0f"
-            )
-
-            if precisedelta == "1 minutes":  # why humanize
-                precisedelta = "1 minute"
-
-            display = models.display_gamertag(
-                xuid, gamertag_map[xuid], config.nicknames.get(xuid), markdown="**"
-            )
-
-            leaderboard_builder.append(f"**{index+1}\\.** {display}: {precisedelta}")
-
         await ctx.send(
             embed=utils.make_embed(
-                "\n".join(leaderboard_builder),
+                stats_utils.format_leaderboard(
+                    leaderboard_counter_sort, gamertag_map, config.nicknames
+                ),
                 title=f"Leaderboard for the past {period_str}",
             )
         )
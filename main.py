@@ -20,6 +20,7 @@ import datetime
 import functools
 import logging
 import os
+import time
 import typing
 import uuid
 from collections import defaultdict
@@ -52,11 +53,17 @@ from interactions.api.events.processors import Processor
 from interactions.api.gateway.state import ConnectionState
 from interactions.ext import prefixed_commands as prefixed
 from tortoise import Tortoise
-from tortoise.expressions import Q
 
 import common.classes as cclasses
+import common.config_cache as config_cache
+import common.fair_queue as fair_queue
+import common.gamertag_store as gamertag_store
 import common.help_tools as help_tools
+import common.invalidation as invalidation
+import common.leader as leader
 import common.models as models
+import common.playerlist_utils as pl_utils
+import common.send_scheduler as send_scheduler
 import common.utils as utils
 import db_settings
 
@@ -281,6 +288,10 @@ class RealmsPlayerlistBot(utils.RealmBotBase):
         return result
 
     async def stop(self) -> None:
+        bot.send_scheduler.stop()
+        bot.live_playerlist_queue.stop()
+        await bot.leader.release()
+        await bot.invalidations.stop()
         await bot.openxbl_session.close()
         await bot.session.close()
         await bot.xbox.close()
@@ -354,6 +365,26 @@ async def start() -> None:
         os.environ["VALKEY_URL"],
         decode_responses=True,
     )
+    bot.gamertag_store = gamertag_store.GamertagStore(
+        bot.valkey, use_hash=utils.FEATURE("HASH_GAMERTAG_STORE")
+    )
+
+    bot.config_cache = config_cache.GuildConfigCache(bot.valkey)
+    await bot.config_cache.populate()
+    bot.create_task(bot.config_cache.listen())
+
+    bot.send_scheduler = send_scheduler.SendScheduler(bot)
+    bot.send_scheduler.start()
+
+    bot.invalidations = invalidation.InvalidationCounter(bot)
+    bot.invalidations.start()
+
+    # only one process should be polling realms and running the autorunners
+    bot.leader = leader.LeaderLease(bot.valkey)
+    bot.create_task(bot.leader.run())
+
+    bot.live_playerlist_queue = fair_queue.RealmFairQueue(bot)
+    bot.live_playerlist_queue.start()
 
     if blacklist_raw := await bot.valkey.get("rpl-blacklist"):
         bot.blacklist = set(orjson.loads(blacklist_raw))
@@ -372,45 +403,30 @@ async def start() -> None:
             live_online_channel__not_isnull=True
         ):
             # if we have a live online channel, we need to reset it
-            await bot.valkey.hset(config.live_online_channel, "xuids", "")
-            await bot.valkey.hset(config.live_online_channel, "gamertags", "")
+            await bot.valkey.hset(
+                config.live_online_channel, mapping={"xuids": "", "gamertags": ""}
+            )
 
     # add all online players to the online cache
     async for player in models.PlayerSession.filter(online=True):
         bot.uuid_cache[player.realm_xuid_id] = player.custom_id
         bot.online_cache[int(player.realm_id)].add(player.xuid)
 
-    if utils.FEATURE("HANDLE_MISSING_REALMS"):
-        async for realm_id in bot.valkey.scan_iter("missing-realm-*"):
-            bot.offline_realms.add(int(realm_id.removeprefix("missing-realm-")))
-
-    async for config in models.GuildConfig.filter(
-        playerlist_chan__not_isnull=True,
-        realm_id__not_isnull=True,
-        player_watchlist__not_isnull=True,
+    if utils.FEATURE("HANDLE_MISSING_REALMS") and not await bot.valkey.exists(
+        utils.MISSING_REALMS_KEY
     ):
-        # add all player watchlist players to the player watchlist store
-        for player_xuid in config.player_watchlist:
-            bot.player_watchlist_store[f"{config.realm_id}-{player_xuid}"].add(
-                config.guild_id
-            )
-
-    # add info for who has premium features on and has valid premium
-    async for config in models.GuildConfig.filter(
-        Q(premium_code__id__not_isnull=True)
-        & Q(
-            Q(premium_code__expires_at__isnull=True)
-            | Q(
-                premium_code__expires_at__gt=ipy.Timestamp.utcnow()
-                - datetime.timedelta(days=1)
-            )
-        )
-        & Q(realm_id__not_isnull=True)
-    ).prefetch_related("premium_code"):
-        if config.playerlist_chan and config.live_playerlist:
-            bot.live_playerlist_store[config.realm_id].add(config.guild_id)  # type: ignore
-        if config.fetch_devices:
-            bot.fetch_devices_for.add(config.realm_id)
+        # one-time move over from the old per-realm counters, which counted
+        # how many minutes the realm had been missing for
+        now = time.time()
+        async for key in bot.valkey.scan_iter("missing-realm-*"):
+            if minutes := await bot.valkey.get(key):
+                await bot.valkey.zadd(
+                    utils.MISSING_REALMS_KEY,
+                    {key.removeprefix("missing-realm-"): now - int(minutes) * 60},
+                )
+            await bot.valkey.delete(key)
+
+    await pl_utils.load_realm_stores(bot)
 
     bot.fully_ready = asyncio.Event()
     bot.pl_sem = asyncio.Semaphore(12)  # TODO: maybe increase this?
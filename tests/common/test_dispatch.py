@@ -0,0 +1,127 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import types
+import typing
+
+import interactions as ipy
+import pytest
+
+import common.dispatch as dispatch
+
+
+class _FakeScheduler:
+    def retry_after(self, _channel_id: int) -> float:
+        return 0.0
+
+
+class _FakeBot:
+    send_scheduler = _FakeScheduler()
+
+    def create_task(self, coro: typing.Coroutine) -> asyncio.Task:
+        return asyncio.create_task(coro)
+
+
+def _server_error() -> ipy.errors.HTTPException:
+    return ipy.errors.HTTPException(
+        types.SimpleNamespace(status=500, reason="Internal Server Error")  # type: ignore
+    )
+
+
+def _dispatcher(**kwargs: typing.Any) -> dispatch.StaggeredDispatcher:
+    return dispatch.StaggeredDispatcher(
+        _FakeBot(),  # type: ignore
+        window=0,
+        concurrency=1,
+        **kwargs,
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(dispatch, "RETRY_BACKOFF", 0.0)
+
+
+def test_retry_resumes_from_unsent() -> None:
+    sent: list[int] = []
+    attempts = 0
+
+    async def func(job: dispatch.DispatchJob) -> None:
+        nonlocal attempts
+        attempts += 1
+
+        for index in range(3):
+            if index < job.sent:
+                continue
+
+            job.mark_sending()
+            if attempts == 1 and index == 1:
+                raise _server_error()
+            sent.append(index)
+            job.mark_sent()
+
+    job = dispatch.DispatchJob(key=1, channel_id=1, func=func)
+    stats = asyncio.run(_dispatcher().run([job]))
+
+    assert sent == [0, 1, 2]
+    assert job.sent == 3
+    assert stats.completed == 1
+    assert stats.retried == 1
+
+
+def test_no_retry_on_timeout_mid_send() -> None:
+    attempts = 0
+
+    async def func(job: dispatch.DispatchJob) -> None:
+        nonlocal attempts
+        attempts += 1
+
+        job.mark_sending()
+        await asyncio.sleep(1)
+
+    job = dispatch.DispatchJob(key=1, channel_id=1, func=func)
+    stats = asyncio.run(_dispatcher(timeout=0.01).run([job]))
+
+    assert attempts == 1
+    assert stats.timed_out == 1
+    assert stats.retried == 0
+
+
+def test_retry_on_timeout_between_sends() -> None:
+    attempts = 0
+
+    async def func(_job: dispatch.DispatchJob) -> None:
+        nonlocal attempts
+        attempts += 1
+
+        if attempts == 1:
+            await asyncio.sleep(1)
+
+    job = dispatch.DispatchJob(key=1, channel_id=1, func=func)
+    stats = asyncio.run(_dispatcher(timeout=0.01).run([job]))
+
+    assert attempts == 2
+    assert stats.completed == 1
+    assert stats.retried == 1
+
+
+def test_stable_slot() -> None:
+    slots = [dispatch.stable_slot(key, 60) for key in range(100)]
+
+    assert slots == [dispatch.stable_slot(key, 60) for key in range(100)]
+    assert all(0 <= slot < 60 for slot in slots)
+    assert dispatch.stable_slot(1, 0) == 0.0
@@ -0,0 +1,72 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import common.embed_templates as embed_templates
+
+
+def _embed(length: int) -> dict:
+    return {"description": "a" * length}
+
+
+def test_pack_embeds_count_limit() -> None:
+    embeds = [_embed(1) for _ in range(embed_templates.MAX_EMBEDS_PER_MESSAGE * 2 + 3)]
+    results = embed_templates.pack_embeds(embeds)
+
+    assert [len(m) for m in results] == [
+        embed_templates.MAX_EMBEDS_PER_MESSAGE,
+        embed_templates.MAX_EMBEDS_PER_MESSAGE,
+        3,
+    ]
+    assert [e for m in results for e in m] == embeds
+
+
+def test_pack_embeds_char_limit() -> None:
+    # two of these fit together, but a third would go over the limit
+    length = embed_templates.MAX_EMBED_CHARS_PER_MESSAGE // 3 + 1
+    embeds = [_embed(length) for _ in range(5)]
+    results = embed_templates.pack_embeds(embeds)
+
+    assert [len(m) for m in results] == [2, 2, 1]
+    assert all(
+        sum(embed_templates.embed_length(e) for e in m)
+        <= embed_templates.MAX_EMBED_CHARS_PER_MESSAGE
+        for m in results
+    )
+
+
+def test_pack_embeds_exact_char_limit() -> None:
+    embeds = [
+        _embed(embed_templates.MAX_EMBED_CHARS_PER_MESSAGE - 100),
+        _embed(100),
+        _embed(1),
+    ]
+    assert embed_templates.pack_embeds(embeds) == [embeds[:2], embeds[2:]]
+
+
+def test_embed_length() -> None:
+    embed = {
+        "title": "abc",
+        "description": "de",
+        "footer": {"text": "f"},
+        "author": {"name": "gh"},
+        "fields": [{"name": "i", "value": "jk", "inline": True}],
+        "color": 123456,
+    }
+    assert embed_templates.embed_length(embed) == 11
+
+
+def test_pack_embeds_empty() -> None:
+    assert embed_templates.pack_embeds([]) == []
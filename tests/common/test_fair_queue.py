@@ -0,0 +1,65 @@
+"""
+Copyright 2020-2026 AstreaTSS.
+This file is part of the Realms Playerlist Bot.
+
+The Realms Playerlist Bot is free software: you can redistribute it and/or modify it under
+the terms of the GNU Affero General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+The Realms Playerlist Bot is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR
+PURPOSE. See the GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License along with the Realms
+Playerlist Bot. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import common.fair_queue as fair_queue
+
+
+async def _noop() -> None:
+    pass
+
+
+def _drain(queue: fair_queue.RealmFairQueue) -> list[str]:
+    order: list[str] = []
+    while popped := queue._pop():
+        order.append(popped[0])
+    return order
+
+
+def test_round_robin_quantum() -> None:
+    queue = fair_queue.RealmFairQueue(None, quantum=2)  # type: ignore
+    for _ in range(5):
+        queue.put("a", _noop)
+    for _ in range(3):
+        queue.put("b", _noop)
+    queue.put("c", _noop)
+
+    assert _drain(queue) == ["a", "a", "b", "b", "c", "a", "a", "b", "a"]
+
+
+def test_realm_forgotten_when_empty() -> None:
+    queue = fair_queue.RealmFairQueue(None, quantum=2)  # type: ignore
+    queue.put("a", _noop)
+    assert _drain(queue) == ["a"]
+
+    assert not queue._queues
+    assert not queue._active
+    assert not queue._deficits
+
+    # coming back starts a fresh turn
+    for _ in range(3):
+        queue.put("a", _noop)
+    queue.put("b", _noop)
+    assert _drain(queue) == ["a", "a", "b", "a"]
+
+
+def test_new_realm_joins_back_of_line() -> None:
+    queue = fair_queue.RealmFairQueue(None, quantum=1)  # type: ignore
+    queue.put("a", _noop)
+    queue.put("a", _noop)
+
+    assert queue._pop()[0] == "a"  # type: ignore
+    queue.put("b", _noop)
+    assert _drain(queue) == ["b", "a"]
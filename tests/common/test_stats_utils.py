@@ -44,3 +44,18 @@ def test_timespan_minutes_per_day_of_the_week() -> None:
 def test_calc_leaderboard() -> None:
     results = stats_utils.calc_leaderboard(stats_utils_models.TEST_DATETIMES)
     assert results == stats_utils_models.CALC_LEADERBOARD_RESULTS
+
+
+def test_calc_leaderboards() -> None:
+    earliest = min(d.joined_at for d in stats_utils_models.TEST_DATETIMES)
+    latest = max(d.joined_at for d in stats_utils_models.TEST_DATETIMES)
+    midpoint = earliest + (latest - earliest) / 2
+
+    results = stats_utils.calc_leaderboards(
+        stats_utils_models.TEST_DATETIMES,
+        {"all": earliest, "half": midpoint},
+    )
+    assert results["all"] == stats_utils_models.CALC_LEADERBOARD_RESULTS
+    assert results["half"] == stats_utils.calc_leaderboard(
+        d for d in stats_utils_models.TEST_DATETIMES if d.joined_at >= midpoint
+    )